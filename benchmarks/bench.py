@@ -0,0 +1,152 @@
+"""
+Benchmarks of the build of a synthetic blog. A blog is generated with the given number of posts, tags, date spread and
+body size, and then the following scenarios are measured:
+
+    cold:           build from scratch, without any previous output or cache
+    no-op:          build again without any change
+    single-edit:    build after editing the body of a single post
+    config-change:  build after changing the config file, which rebuilds the whole site
+
+The results are printed and appended as a JSON line to the output file, so that different runs, e.g., before and after
+a change, can be compared on the same machine. Usage example:
+
+    python benchmarks/bench.py --posts 2000 --tags 100 --years 10 --repeat 3
+"""
+import argparse
+import contextlib
+import datetime as dt
+import io
+import json
+import platform
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from yabi import __version__
+from yabi import command_line as cli
+from yabi.blog import Blog
+
+SCENARIOS = ['cold', 'no-op', 'single-edit', 'config-change']
+WORDS = ['lorem', 'ipsum', 'dolor', 'sit', 'amet', 'consectetur', 'adipiscing', 'elit', 'sed', 'do', 'eiusmod', 'tempor',
+         'incididunt', 'ut', 'labore', 'et', 'dolore', 'magna', 'aliqua']
+
+
+def parse_cli_arguments():
+    parser = argparse.ArgumentParser(description='Benchmarks the build of a synthetic yabi blog')
+    parser.add_argument('--posts', help='Number of posts', type=int, default=1000)
+    parser.add_argument('--tags', help='Number of different tags', type=int, default=50)
+    parser.add_argument('--tags-per-post', help='Maximum number of tags of a post', type=int, default=3)
+    parser.add_argument('--years', help='Number of years over which the posts are spread', type=int, default=5)
+    parser.add_argument('--body-size', help='Approximate size of the body of each post in characters', type=int, default=2000)
+    parser.add_argument('--jobs', help='Number of worker processes of the build', type=int, default=1)
+    parser.add_argument('--repeat', help='Number of times each scenario is measured', type=int, default=3)
+    parser.add_argument('--seed', help='Seed of the random generator of the blog', type=int, default=0)
+    parser.add_argument('--output', help='File where the results are appended', type=Path, default=Path('bench_results.jsonl'))
+    return parser.parse_args()
+
+
+def generate_blog(path: Path, posts: int, tags: int, tags_per_post: int, years: int, body_size: int, seed: int) -> Blog:
+    """ Creates a new blog with random posts. The same seed always produces the same blog """
+    randomizer = random.Random(seed)
+    blog = Blog(path)
+    with contextlib.redirect_stdout(io.StringIO()):
+        blog.create()
+
+    last_date = dt.date(2023, 1, 1)
+    all_tags = [f'tag_{idx}' for idx in range(tags)]
+    for idx in range(posts):
+        date = last_date - dt.timedelta(days=randomizer.randrange(years * 365))
+        post_tags = randomizer.sample(all_tags, randomizer.randint(1, min(tags_per_post, tags)))
+        paragraphs = []
+        while sum(len(paragraph) for paragraph in paragraphs) < body_size:
+            paragraphs.append(' '.join(randomizer.choices(WORDS, k=randomizer.randint(20, 80))).capitalize() + '.')
+        text = f'draft: no\ndate: {date.isoformat()}\ntags: [{", ".join(post_tags)}]\n\n# Post number {idx}\n\n'
+        (blog.posts_path / f'post_{idx}.md').write_text(text + '\n\n'.join(paragraphs) + '\n')
+    return blog
+
+
+def reset_build_state(blog: Blog):
+    """ Removes the output and all the caches, as if the blog was never built """
+    shutil.rmtree(blog.website_path, ignore_errors=True)
+    for cache_path in blog.main_path.glob('.yabi_*'):
+        if cache_path.is_dir():
+            shutil.rmtree(cache_path)
+        else:
+            cache_path.unlink()
+
+
+def measure_build(blog: Blog, jobs: int) -> tuple[float, dict]:
+    """ Returns the wall time of a build along with its per-phase timings """
+    blog = Blog(blog.main_path)  # as a new invocation of the command line would do
+    start_time = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        cli.build(blog, force=False, jobs=jobs)
+    elapsed_time = time.perf_counter() - start_time
+    return elapsed_time, blog.profiler.report()['phases']
+
+
+def run_scenarios(blog: Blog, jobs: int, repeat: int) -> dict[str, dict]:
+    timings = {scenario: [] for scenario in SCENARIOS}
+    phases = {}
+    edited_post_path = blog.posts_path / 'post_0.md'
+    for iteration in range(repeat):
+        reset_build_state(blog)
+        timings['cold'].append(measure_build(blog, jobs))
+        timings['no-op'].append(measure_build(blog, jobs))
+
+        with edited_post_path.open('a') as file:
+            file.write(f'\nAn edit on iteration {iteration}.\n')
+        timings['single-edit'].append(measure_build(blog, jobs))
+
+        config = json.loads(blog.config_path.read_text())
+        config['website_name'] = f'Benchmark {iteration}'
+        blog.config_path.write_text(json.dumps(config))
+        timings['config-change'].append(measure_build(blog, jobs))
+
+    results = {}
+    for scenario, measurements in timings.items():
+        seconds = [elapsed_time for elapsed_time, _ in measurements]
+        results[scenario] = {'min': min(seconds), 'median': statistics.median(seconds), 'max': max(seconds),
+                             'phases': min(measurements, key=lambda measurement: measurement[0])[1]}
+    return results
+
+
+def get_git_revision() -> str | None:
+    try:
+        process = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                 cwd=Path(__file__).parent, check=True)
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return process.stdout.strip()
+
+
+def main():
+    args = parse_cli_arguments()
+    parameters = {'posts': args.posts, 'tags': args.tags, 'tags_per_post': args.tags_per_post, 'years': args.years,
+                  'body_size': args.body_size, 'jobs': args.jobs, 'repeat': args.repeat, 'seed': args.seed}
+
+    with tempfile.TemporaryDirectory() as temporary_directory:
+        print(f'Generating a blog with {args.posts} posts...')
+        blog = generate_blog(Path(temporary_directory) / 'blog', args.posts, args.tags, args.tags_per_post, args.years,
+                             args.body_size, args.seed)
+        results = run_scenarios(blog, args.jobs, args.repeat)
+
+    print(f'{"Scenario":<16}{"Min (s)":>10}{"Median (s)":>12}{"Max (s)":>10}')
+    for scenario, result in results.items():
+        print(f'{scenario:<16}{result["min"]:>10.3f}{result["median"]:>12.3f}{result["max"]:>10.3f}')
+
+    record = {'timestamp': dt.datetime.now().isoformat(timespec='seconds'), 'yabi_version': __version__,
+              'git_revision': get_git_revision(), 'python': platform.python_version(), 'platform': platform.platform(),
+              'machine': platform.machine(), 'parameters': parameters, 'results': results}
+    with args.output.open('a') as file:
+        file.write(json.dumps(record) + '\n')
+    print(f'Results appended to {args.output}')
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,3 +1,25 @@
+import datetime as dt
+import os
+
+from yabi.blog import Blog
+from yabi.post import Post
+from yabi.post_index import PostIndex
+
+
+def _save_manifest(blog, posts):
+    for post in posts:
+        blog.record_post(post)
+    blog.update_manifest()
+    blog.manifest.load()
+
+
+def _are_listings_outdated(blog, posts):
+    blog.load_config()  # starts a new build
+    for post in posts:
+        blog.record_post(post)
+    return blog.are_listings_outdated()
+
+
 def test_create_blog(blog, blog_path):
     blog.create()
 
@@ -25,7 +47,7 @@ def test_build_post(created_blog, post):
 
 def test_build_home_page(created_blog, post):
     created_blog.create_base_website()
-    created_blog.build_home_page([post])
+    created_blog.build_home_page(PostIndex([post.summarize()]))
     index_path = created_blog.website_path / 'index.html'
     assert index_path.exists()
 
@@ -45,3 +67,165 @@ def test_orphan_target_paths(created_blog):
     orphan_paths = set(created_blog.orphan_target_paths())
 
     assert orphan_paths == {created_blog.website_posts_path / 'a_test_post_1.html', created_blog.website_posts_path / 'a_test_post_3.html'}
+
+
+def test_is_post_dirty_uses_manifest(created_blog, post):
+    created_blog.build_post(post)
+    _save_manifest(created_blog, [post])
+
+    # Only touching the source does not make it dirty
+    os.utime(post.source_path, (post.source_path.stat().st_atime, post.target_path.stat().st_mtime + 100))
+    assert not created_blog.is_post_dirty(Post(post.source_path, post.target_path))
+
+    post.source_path.write_text(post.source_path.read_text() + '\nAnother paragraph')
+    assert created_blog.is_post_dirty(Post(post.source_path, post.target_path))
+
+
+def test_are_listings_outdated(created_blog, post, draft_post):
+    _save_manifest(created_blog, [post, draft_post])
+    assert not _are_listings_outdated(created_blog, [post, draft_post])
+    assert _are_listings_outdated(created_blog, [post])
+
+    draft_post.source_path.write_text(draft_post.source_path.read_text().replace('draft: yes', 'draft: no'))
+    assert _are_listings_outdated(created_blog, [post, Post(draft_post.source_path, draft_post.target_path)])
+
+
+def test_config_file_updated_uses_manifest(created_blog, post):
+    _save_manifest(created_blog, [post])
+
+    created_blog.config_path.touch()
+    assert not created_blog.is_config_file_updated()
+
+    created_blog.config_path.write_text('{"website_name": "another name"}')
+    assert created_blog.is_config_file_updated()
+
+
+def test_listing_pages_only_rendered_when_outdated(created_blog, post, post_not_dirty):
+    created_blog.build_tag_page(PostIndex([post.summarize(), post_not_dirty.summarize()]))
+    _save_manifest(created_blog, [post, post_not_dirty])
+    tag_page_path = created_blog.website_tags_path / 'blog.html'
+    os.utime(tag_page_path, (0, 0))
+
+    created_blog.build_tag_page(PostIndex([post.summarize(), post_not_dirty.summarize()]))
+    assert tag_page_path.stat().st_mtime == 0
+
+    post.source_path.write_text(post.source_path.read_text().replace('# a title', '# a new title'))
+    created_blog.build_tag_page(PostIndex([Post(post.source_path, post.target_path).summarize(), post_not_dirty.summarize()]))
+    assert tag_page_path.stat().st_mtime > 0
+    assert 'a new title' in tag_page_path.read_text()
+
+
+def test_iter_posts_uses_metadata_cache(created_blog, post, mocker):
+    post_paths = [post.source_path]
+    content_hash = post.content_hash
+    assert list(created_blog.iter_posts(post_paths)) == [post]
+
+    mock_read = mocker.patch.object(Post, '_read_raw_data', side_effect=AssertionError('The file should not be read'))
+    mocker.patch.object(Post, 'parse_metadata', side_effect=AssertionError('The file should not be parsed'))
+    cached_posts = list(Blog(created_blog.main_path).iter_posts(post_paths))
+    assert cached_posts == [post]
+    assert cached_posts[0].content_hash == content_hash
+    assert cached_posts[0].get_markdown_content() == post.get_markdown_content()  # from the cached offset of the body
+    mock_read.assert_not_called()
+
+    mocker.stopall()
+    post.source_path.write_text(post.source_path.read_text().replace('# a title', '# another title'))
+    assert next(Blog(created_blog.main_path).iter_posts(post_paths)).title == 'another title'
+
+
+def test_templates_overridden_from_data_directory(created_blog, post):
+    created_blog.templates_path.mkdir()
+    (created_blog.templates_path / 'post.html').write_text('<h1>{{ post.title }}</h1>{{ content }}')
+
+    created_blog.build_post(post)
+
+    assert post.target_path.read_text() == '<h1>a title</h1><p>A paragraph</p>'
+    assert any(created_blog.template_cache_path.iterdir())
+
+
+def test_build_post_with_markdown_extensions(created_blog, post):
+    created_blog.config_path.write_text('{"markdown_extensions": ["fenced_code", "footnotes"]}')
+    created_blog.load_config()
+    post.source_path.write_text(post.source_path.read_text() + '[^1]\n\n```\ncode\n```\n\n[^1]: A note')
+    another_post_path = created_blog.posts_path / 'another_post.md'
+    another_post_path.write_text('draft: no\ndate: 2022-12-12\n\n# another title\n\nNo notes')
+    another_post = Post(another_post_path, created_blog.get_post_target_html_path(another_post_path))
+
+    created_blog.build_post(Post(post.source_path, post.target_path))
+    created_blog.build_post(another_post)
+
+    html_page = post.target_path.read_text()
+    assert '<pre><code>code\n</code></pre>' in html_page
+    assert 'class="footnote"' in html_page
+    assert 'class="footnote"' not in another_post.target_path.read_text()
+
+
+def test_build_post_reuses_converted_markdown(created_blog, post, mocker):
+    created_blog.build_post(post)
+    first_html_page = post.target_path.read_text()
+    post.target_path.unlink()
+
+    mock_converter = mocker.patch.object(created_blog, '_get_markdown_converter')
+    created_blog.build_post(Post(post.source_path, post.target_path))
+
+    mock_converter.assert_not_called()
+    assert post.target_path.read_text() == first_html_page
+
+
+def test_build_post_minified(created_blog, post, mocker):
+    created_blog.config_path.write_text('{"minify": true, "markdown_extensions": ["fenced_code"]}')
+    created_blog.load_config()
+    post.source_path.write_text(post.source_path.read_text() + '\n\n```\nif a:\n    b\n```')
+
+    created_blog.create_base_website()
+    created_blog.build_post(Post(post.source_path, post.target_path))
+
+    html_page = post.target_path.read_text()
+    assert '\n' not in html_page.replace('<pre><code>if a:\n    b\n</code></pre>', '')
+    assert '\n' not in (created_blog.website_path / 'style.css').read_text()
+
+    # The same rendered page is not minified again
+    post.target_path.unlink()
+    mock_minify_html = mocker.patch('yabi.minify.minify_html')
+    created_blog.build_post(Post(post.source_path, post.target_path))
+    mock_minify_html.assert_not_called()
+    assert post.target_path.read_text() == html_page
+
+
+def _paginate(blog, number_of_posts):
+    base_path = blog.website_path / 'index'
+    return [(actual_index, previous_page and previous_page.name, next_page and next_page.name, target_path.name, page_posts)
+            for actual_index, previous_page, next_page, target_path, page_posts
+            in blog._iter_posts_pagination(list(range(number_of_posts, 0, -1)), base_path)]
+
+
+def test_pagination_with_exact_multiple_of_page_size(created_blog):
+    created_blog.config_path.write_text('{"posts_per_page": 2}')
+    created_blog.load_config()
+
+    assert _paginate(created_blog, 2) == [(None, None, None, 'index.html', [2, 1])]
+    assert _paginate(created_blog, 4) == [(1, None, 'page_2.html', 'index.html', [4, 3]),
+                                          (2, 'index.html', None, 'page_2.html', [2, 1])]
+
+
+def test_stable_pagination_keeps_older_pages(created_blog):
+    created_blog.config_path.write_text('{"posts_per_page": 2, "stable_pagination": true}')
+    created_blog.load_config()
+
+    assert _paginate(created_blog, 3) == [(None, None, None, 'index.html', [3, 2, 1])]
+    assert _paginate(created_blog, 5) == [(2, None, 'page_1.html', 'index.html', [5, 4, 3]),
+                                          (1, 'index.html', None, 'page_1.html', [2, 1])]
+    assert _paginate(created_blog, 6) == [(3, None, 'page_2.html', 'index.html', [6, 5]),
+                                          (2, 'index.html', 'page_1.html', 'page_2.html', [4, 3]),
+                                          (1, 'page_2.html', None, 'page_1.html', [2, 1])]
+
+
+def test_iter_posts_keeps_first_seen_date(created_blog):
+    post_path = created_blog.posts_path / 'no_date_post.md'
+    post_path.write_text('draft: no\n\n# a title without date\n\nA paragraph')
+    (created_blog.main_path / Blog.POST_DATES_FILE_NAME).write_text('{"no_date_post.md": "2020-02-02"}')
+
+    post, = created_blog.iter_posts([post_path])
+
+    assert post.date == dt.date(2020, 2, 2)
+    assert post_path.read_text() == 'draft: no\n\n# a title without date\n\nA paragraph'
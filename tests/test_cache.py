@@ -0,0 +1,30 @@
+import os
+
+from yabi.cache import FragmentCache
+
+
+def test_fragment_cache_key_depends_on_settings():
+    assert FragmentCache.get_key('text', ['tables']) == FragmentCache.get_key('text', ['tables'])
+    assert FragmentCache.get_key('text', ['tables']) != FragmentCache.get_key('text', [])
+    assert FragmentCache.get_key('text', []) != FragmentCache.get_key('another text', [])
+
+
+def test_fragment_cache_put_and_get(tmp_path):
+    fragment_cache = FragmentCache(tmp_path / 'fragments')
+    assert fragment_cache.get('a_key') is None
+    fragment_cache.put('a_key', '<p>A paragraph</p>')
+    assert fragment_cache.get('a_key') == '<p>A paragraph</p>'
+
+
+def test_fragment_cache_prune_evicts_least_recently_used(tmp_path):
+    fragment_cache = FragmentCache(tmp_path / 'fragments', max_size=20)
+    for idx, key in enumerate(['old', 'used', 'new']):
+        fragment_cache.put(key, 10 * 'a')
+        os.utime(fragment_cache.path / f'{key}.html', ns=(idx * 10 ** 9, idx * 10 ** 9))
+    fragment_cache.get('used')
+
+    fragment_cache.prune()
+
+    assert fragment_cache.get('old') is None
+    assert fragment_cache.get('used') is not None
+    assert fragment_cache.get('new') is not None
@@ -1,6 +1,18 @@
+import argparse
+import gzip
+import json
+import os
+import shutil
+import subprocess
+import sys
 from pathlib import Path
 
+import pytest
+
 from yabi import command_line as cli
+from yabi.blog import Blog
+from yabi.cache import MetadataCache
+from yabi.server import create_server
 
 
 def test_init(mocker):
@@ -15,7 +27,6 @@ def test_init(mocker):
 
 def test_build_no_posts(created_blog, mocker):
     mock_load_config = mocker.patch.object(created_blog, 'load_config')
-    mock_copy = mocker.patch('shutil.copy')
     mock_build_post = mocker.patch.object(created_blog, 'build_post')
     mock_build_home_page = mocker.patch.object(created_blog, 'build_home_page')
     mock_build_tag_page = mocker.patch.object(created_blog, 'build_tag_page')
@@ -24,7 +35,7 @@ def test_build_no_posts(created_blog, mocker):
     cli.build(created_blog, force=False)
 
     mock_load_config.assert_called_once()
-    mock_copy.assert_not_called()
+    assert not (created_blog.website_path / created_blog.CSS_FILE_NAME).exists()
     mock_update_last_build_file.assert_not_called()
     mock_build_post.assert_not_called()
     mock_build_home_page.assert_not_called()
@@ -33,7 +44,6 @@ def test_build_no_posts(created_blog, mocker):
 
 def test_build_change_config_files(created_blog, mocker, post_not_dirty):
     mocker.patch.object(created_blog, 'load_config')
-    mock_copy = mocker.patch('shutil.copy')
     mock_build_post = mocker.patch.object(created_blog, 'build_post')
     mock_build_home_page = mocker.patch.object(created_blog, 'build_home_page')
     mock_build_tag_page = mocker.patch.object(created_blog, 'build_tag_page')
@@ -45,7 +55,7 @@ def test_build_change_config_files(created_blog, mocker, post_not_dirty):
 
     cli.build(created_blog, force=False)
 
-    mock_copy.assert_called_with(created_blog.default_css_file_path, created_blog.website_path)
+    assert (created_blog.website_path / created_blog.CSS_FILE_NAME).read_bytes() == created_blog.default_css_file_path.read_bytes()
     mock_update_last_build_file.assert_called_once()
     assert len(mock_build_post.call_args_list) == 1
     assert mock_build_post.call_args_list[0].args[0] == post_not_dirty
@@ -55,7 +65,6 @@ def test_build_change_config_files(created_blog, mocker, post_not_dirty):
 
 def test_build_with_posts(created_blog, mocker, post, draft_post, post_not_dirty, orphaned_target):
     mocker.patch.object(created_blog, 'load_config')
-    mock_copy_tree = mocker.patch('shutil.copy')
     mock_build_post = mocker.patch.object(created_blog, 'build_post')
     mock_build_home_page = mocker.patch.object(created_blog, 'build_home_page')
     mock_build_tag_page = mocker.patch.object(created_blog, 'build_tag_page')
@@ -66,7 +75,7 @@ def test_build_with_posts(created_blog, mocker, post, draft_post, post_not_dirty
 
     cli.build(created_blog, force=False)
 
-    mock_copy_tree.assert_called_with(created_blog.default_css_file_path, created_blog.website_path)
+    assert (created_blog.website_path / created_blog.CSS_FILE_NAME).read_bytes() == created_blog.default_css_file_path.read_bytes()
     mock_update_last_build_file.assert_called_once()
     mock_build_home_page.assert_called_once()
     mock_build_tag_page.assert_called_once()
@@ -76,11 +85,199 @@ def test_build_with_posts(created_blog, mocker, post, draft_post, post_not_dirty
     assert mock_build_post.call_args_list[0].args[0] == post
 
 
+def test_build_keeps_unchanged_style_sheet(created_blog, post):
+    cli.build(created_blog, force=False)
+    css_path = created_blog.website_path / created_blog.CSS_FILE_NAME
+    os.utime(css_path, (0, 0))
+
+    cli.build(created_blog, force=False)
+
+    assert css_path.stat().st_mtime == 0
+
+
 def test_serve(mocker, tmp_path):
-    mocked_httpd_serve_forever = mocker.patch('socketserver.TCPServer.serve_forever')
-    mocked_chdir = mocker.patch('os.chdir')
+    mocked_httpd_serve_forever = mocker.patch('http.server.ThreadingHTTPServer.serve_forever')
+    mocked_create_server = mocker.patch('yabi.server.create_server', wraps=create_server)
 
-    cli.serve(tmp_path)
+    cli.serve(tmp_path, 'localhost', 0)
 
-    mocked_chdir.assert_called_with(tmp_path)
+    mocked_create_server.assert_called_with(tmp_path, 'localhost', 0)
     mocked_httpd_serve_forever.assert_called_once()
+
+
+def test_watch_survives_broken_post(created_blog, mocker, capsys):
+    mocked_create_watcher = mocker.patch('yabi.command_line.create_watcher')
+    mocked_thread = mocker.patch('threading.Thread')
+    (created_blog.posts_path / 'broken_post.md').write_text('draft: no\n\nno title here')
+
+    cli.watch(created_blog)
+
+    assert 'Error: ' in capsys.readouterr().out
+    mocked_create_watcher.assert_called_once()
+    mocked_thread.return_value.start.assert_called_once()
+
+
+def test_parallel_build_matches_serial_build(created_blog, post, draft_post, post_not_dirty):
+    cli.build(created_blog, force=True, jobs=1)
+    serial_output = {path: path.read_bytes() for path in created_blog.website_path.rglob('*.html')}
+
+    cli.build(created_blog, force=True, jobs=2)
+    parallel_output = {path: path.read_bytes() for path in created_blog.website_path.rglob('*.html')}
+
+    assert serial_output == parallel_output
+
+
+def test_parallel_build_error_names_source_file(created_blog):
+    created_blog.create_base_website()
+    broken_post_path = created_blog.posts_path / 'broken_post.md'
+    broken_post_path.write_text('draft: no\n\nno title here')
+
+    with pytest.raises(ValueError, match='broken_post.md'):
+        cli.build(created_blog, force=True, jobs=2)
+
+
+def test_build_deletes_stale_pages(created_blog, post, draft_post):
+    tagged_post_path = created_blog.posts_path / 'a_tagged_post.md'
+    tagged_post_path.write_text('draft: no\ndate: 2021-05-01\ntags: a_tag\n\n# a tagged post\n\nA paragraph')
+    cli.build(created_blog, force=False)
+    tagged_post_target_path = created_blog.website_posts_path / 'a_tagged_post.html'
+    tag_page_path = created_blog.website_tags_path / 'a_tag.html'
+    archive_page_path = created_blog.website_archive_path / '2021' / 'may.html'
+    assert tagged_post_target_path.exists() and tag_page_path.exists() and archive_page_path.exists()
+
+    tagged_post_path.unlink()
+    cli.build(created_blog, force=False)
+
+    assert not tagged_post_target_path.exists()
+    assert not tag_page_path.exists()
+    assert not archive_page_path.exists()
+    assert post.target_path.exists()
+
+
+def test_build_precompresses_changed_files(created_blog, post):
+    config = json.loads(created_blog.config_path.read_text())
+    created_blog.config_path.write_text(json.dumps({**config, 'precompress': True}))
+    cli.build(created_blog, force=False)
+    compressed_post_path = post.target_path.with_name(post.target_path.name + '.gz')
+    compressed_css_path = created_blog.website_path / 'style.css.gz'
+    assert gzip.decompress(compressed_post_path.read_bytes()) == post.target_path.read_bytes()
+    assert compressed_css_path.exists()
+
+    os.utime(compressed_css_path, (0, 0))
+    post.source_path.write_text(post.source_path.read_text() + '\n\nAnother paragraph')
+    cli.build(created_blog, force=False)
+    assert gzip.decompress(compressed_post_path.read_bytes()) == post.target_path.read_bytes()
+    assert compressed_css_path.stat().st_mtime == 0  # unchanged files are not compressed again
+
+    created_blog.config_path.write_text(json.dumps(config))
+    cli.build(created_blog, force=False)
+    assert not compressed_post_path.exists() and not compressed_css_path.exists()
+
+
+def test_build_precompresses_rewritten_files(created_blog, post):
+    config = json.loads(created_blog.config_path.read_text())
+    created_blog.config_path.write_text(json.dumps({**config, 'precompress': True}))
+    cli.build(created_blog, force=False)
+    shutil.rmtree(created_blog.website_path)
+
+    cli.build(created_blog, force=False)
+
+    compressed_post_path = post.target_path.with_name(post.target_path.name + '.gz')
+    assert gzip.decompress(compressed_post_path.read_bytes()) == post.target_path.read_bytes()
+    deploy_manifest = json.loads(created_blog.deploy_manifest_path.read_text())
+    assert all((created_blog.website_path / key).exists() for key in deploy_manifest['files'])
+
+
+def test_startup_does_not_import_slow_dependencies(tmp_path):
+    # Regression test of the startup time: these modules are only imported once a command needs them
+    slow_modules = ['brotli', 'concurrent.futures', 'gzip', 'http.server', 'jinja2', 'markdown', 'sqlite3', 'watchdog']
+    code = (f'import sys; from pathlib import Path; from yabi import command_line; command_line.Blog(Path({str(tmp_path)!r})); '
+            f'print(*[module for module in {slow_modules!r} if module in sys.modules])')
+    process = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True)
+    assert process.stdout.split() == []
+
+
+def test_sharded_build_matches_full_build(created_blog, post, draft_post, post_not_dirty):
+    for idx in range(5):
+        (created_blog.posts_path / f'post_{idx}.md').write_text(f'draft: no\ndate: 2021-0{idx + 1}-01\ntags: tag_{idx % 2}\n\n'
+                                                                f'# Post {idx}\n\nA paragraph')
+    cli.build(created_blog, force=True)
+    full_output = {path: path.read_bytes() for path in created_blog.website_path.rglob('*.html')}
+    shutil.rmtree(created_blog.website_path)
+    created_blog.manifest.path.unlink()
+
+    for shard_index in (1, 2, 3):
+        cli.build(created_blog, force=False, shard=(shard_index, 3))
+    assert not (created_blog.website_path / 'index.html').exists()
+    assert cli.merge(created_blog) is None
+
+    assert {path: path.read_bytes() for path in created_blog.website_path.rglob('*.html')} == full_output
+
+
+def test_shard_builds_keep_other_posts_state(created_blog):
+    post_keys = [f'post_{idx}.md' for idx in range(6)]
+    for key in post_keys:
+        (created_blog.posts_path / key).write_text(f'draft: no\n\n# {key}\n\nA paragraph')
+    dates = {key: '2001-01-01' for key in post_keys}
+    post_dates_path = created_blog.main_path / created_blog.POST_DATES_FILE_NAME
+    post_dates_path.write_text(json.dumps(dates))
+    cli.build(created_blog, force=False)
+
+    for shard_index in (1, 2):
+        cli.build(Blog(created_blog.main_path), force=False, shard=(shard_index, 2))
+
+    assert json.loads(post_dates_path.read_text()) == dates
+    metadata_cache = MetadataCache(created_blog.main_path / created_blog.METADATA_CACHE_FILE_NAME)
+    metadata_cache.load()
+    assert sorted(metadata_cache._entries) == post_keys
+
+
+def test_merge_requires_all_shards(created_blog, post):
+    cli.build(created_blog, force=False, shard=(1, 2))
+    assert cli.merge(created_blog) == 1
+
+
+def test_merge_rejects_outdated_summaries(created_blog, post, draft_post):
+    deleted_post_path = created_blog.posts_path / 'deleted_post.md'
+    deleted_post_path.write_text('draft: no\ndate: 2021-05-01\n\n# Deleted post\n\nA paragraph')
+    cli.build(created_blog, force=False, shard=(1, 1))
+    deleted_post_path.unlink()
+    assert cli.merge(created_blog) == 1
+
+    cli.build(created_blog, force=False, shard=(1, 1))
+    post.source_path.write_text(post.source_path.read_text() + '\n\nAnother paragraph')
+    assert cli.merge(created_blog) == 1
+
+    cli.build(created_blog, force=False, shard=(1, 1))
+    assert cli.merge(created_blog) is None
+    assert not created_blog.shards_path.exists()
+
+
+def test_parse_shard():
+    assert cli._parse_shard('2/4') == (2, 4)
+    for invalid_shard in ('0/4', '5/4', '1', 'a/b'):
+        with pytest.raises(argparse.ArgumentTypeError):
+            cli._parse_shard(invalid_shard)
+
+
+@pytest.mark.parametrize('jobs', [1, 2])
+def test_check_reports_all_errors(created_blog, post, capsys, monkeypatch, jobs):
+    monkeypatch.setattr(cli, 'MIN_POSTS_TO_CHECK_IN_PARALLEL', 1)
+    (created_blog.posts_path / 'bad_date.md').write_text('draft: no\ndate: 2021-13-01\n\n# Bad date\n\nA paragraph')
+    (created_blog.posts_path / 'no_draft.md').write_text('date: 2021-01-01\n\n# No draft\n\nA paragraph')
+    (created_blog.posts_path / 'no_title.md').write_text('draft: no\n\nA paragraph')
+
+    assert cli.check(created_blog, jobs, 'json') == 1
+
+    report = json.loads(capsys.readouterr().out)
+    assert report['posts'] == 4
+    assert [Path(error['path']).name for error in report['errors']] == ['bad_date.md', 'no_draft.md', 'no_title.md']
+    assert not post.target_path.exists()
+
+
+def test_check_uses_metadata_cache(created_blog, post, mocker):
+    assert cli.check(created_blog) == 0
+
+    spy_parse_metadata = mocker.spy(cli.Post, 'parse_metadata')
+    assert cli.check(created_blog) == 0
+    spy_parse_metadata.assert_not_called()
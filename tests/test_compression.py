@@ -0,0 +1,26 @@
+import gzip
+import sys
+
+from yabi import compression
+
+
+def test_compress_file(tmp_path, mocker, request):
+    page_path = tmp_path / 'page.html'
+    page_path.write_text('<p>content</p>' * 100)
+    mocker.patch.dict(sys.modules, {'brotli': mocker.Mock(compress=lambda data: b'brotli ' + data[:10])})
+    compression.get_compressors.cache_clear()
+    request.addfinalizer(compression.get_compressors.cache_clear)
+
+    sidecars = compression.compress_files([page_path], threads=2)
+
+    assert [sidecar_path.name for sidecar_path, _, _ in sidecars] == ['page.html.gz', 'page.html.br']
+    assert gzip.decompress((tmp_path / 'page.html.gz').read_bytes()) == page_path.read_bytes()
+    assert (tmp_path / 'page.html.br').read_bytes() == b'brotli <p>content'
+    assert sorted(path.name for path in tmp_path.iterdir()) == ['page.html', 'page.html.br', 'page.html.gz']
+
+
+def test_is_compressible():
+    assert compression.is_compressible('posts/a_post.html')
+    assert compression.is_compressible('style.css')
+    assert not compression.is_compressible('style.css.gz')
+    assert not compression.is_compressible('image.png')
@@ -0,0 +1,24 @@
+from yabi.manifest import BuildManifest, diff_outputs
+
+
+def test_save_and_load(tmp_path):
+    manifest = BuildManifest(tmp_path / 'manifest.json')
+    manifest.config_hash = 'a_hash'
+    manifest.posts = {'a_post.md': BuildManifest.make_post_entry('another_hash', {'draft': 'no'}, ['posts/a_post.html'])}
+    manifest.outputs = {'posts/a_post.html': ['a_third_hash', 10]}
+    manifest.save()
+
+    loaded_manifest = BuildManifest(tmp_path / 'manifest.json')
+    loaded_manifest.load()
+    assert loaded_manifest.config_hash == manifest.config_hash
+    assert loaded_manifest.posts == manifest.posts
+    assert loaded_manifest.outputs == manifest.outputs
+
+
+def test_diff_outputs():
+    previous_outputs = {'index.html': ['a', 1], 'posts/changed.html': ['b', 2], 'posts/deleted.html': ['c', 3]}
+    outputs = {'index.html': ['a', 1], 'posts/changed.html': ['d', 2], 'posts/added.html': ['e', 3]}
+
+    assert diff_outputs(previous_outputs, outputs, {'posts/orphan.html'}) == {'added': ['posts/added.html'],
+                                                                             'changed': ['posts/changed.html'],
+                                                                             'deleted': ['posts/deleted.html', 'posts/orphan.html']}
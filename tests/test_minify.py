@@ -0,0 +1,49 @@
+import re
+import textwrap
+from pathlib import Path
+
+import yabi
+from yabi.minify import minify_css, minify_html
+
+
+def test_minify_html_keeps_preformatted_content():
+    html = textwrap.dedent(
+        """
+        <!DOCTYPE html>
+        <html>
+            <!-- a comment -->
+            <body>
+                <p>Some   <em>inline</em>   text</p>
+                <pre><code>def f():
+            return  1
+        </code></pre>
+                <p>Inline <code>a  =  b</code> code</p>
+            </body>
+        </html>
+        """)
+
+    assert minify_html(html) == ('<!DOCTYPE html><html><body><p>Some <em>inline</em> text</p><pre><code>def f():\n'
+                                 '    return  1\n</code></pre><p>Inline <code>a  =  b</code> code</p></body></html>')
+
+
+def test_minify_html_keeps_space_between_list_items():
+    # The items of the navigation bar are displayed inline by the default style sheet
+    base_template = (Path(yabi.__file__).parent / 'templates' / 'base.html').read_text()
+    nav = re.search(r'<nav>.*</nav>', base_template, re.DOTALL).group()
+
+    assert minify_html(nav) == ('<nav><ul><li><a href="">Home</a></li> <li><a href="archive.html">Archive</a></li> '
+                                '<li><a href="tags.html">Tags</a></li></ul></nav>')
+
+
+def test_minify_css():
+    css = textwrap.dedent(
+        """
+        /* a comment */
+        body    { font: 17px/25px Verdana, sans-serif;
+                  margin: auto; }
+        a:hover { content: "a  /* string */ ;"; }
+        @media screen and (max-width: 600px) { main { padding: 0; } }
+        """)
+
+    assert minify_css(css) == ('body{font:17px/25px Verdana,sans-serif;margin:auto}a:hover{content:"a  /* string */ ;"}'
+                               '@media screen and (max-width:600px){main{padding:0}}')
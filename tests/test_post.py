@@ -1,10 +1,11 @@
 import datetime as dt
+import pickle
 from inspect import cleandoc
 from pathlib import Path
 
 import pytest
 
-from yabi.post import Post
+from yabi.post import Post, PostSummary
 
 
 @pytest.fixture()
@@ -132,22 +133,30 @@ def test_parse_markdown(valid_text_path, dummy_target_path):
     assert post.get_content_in_html() == expected_html
 
 
-def test_add_date_to_file(valid_text_no_date_path, dummy_target_path):
+def test_default_date_does_not_modify_file(valid_text_no_date_path, dummy_target_path):
+    original_post_file_content = valid_text_no_date_path.read_text()
     post = Post(valid_text_no_date_path, dummy_target_path)
-    todays_date = dt.date.today()
-    expected_post_file_content = cleandoc(f"""
-    date: {todays_date.isoformat()}
-    draft: yes
 
-    # My no date post
-    
-    This post does not have a date but it should!
-    
-    """)
-    assert post._metadata['date'] == todays_date
-    with post.source_path.open() as file:
-        post_file_content = file.read()
-    assert expected_post_file_content == post_file_content
+    assert post._metadata['date'] == dt.date.today()
+    assert post.is_date_missing
+    assert valid_text_no_date_path.read_text() == original_post_file_content
+
+
+def test_markdown_content_starts_after_title(tmp_path, dummy_target_path):
+    post_path = tmp_path / 'post.md'
+    post_path.write_text('draft: no\nsummary: my title\n\n# My title\n\nThe body of my title')
+
+    assert Post(post_path, dummy_target_path).get_markdown_content() == 'The body of my title'
+    metadata = Post(post_path, dummy_target_path).parse_metadata()
+    assert Post(post_path, dummy_target_path, metadata).get_markdown_content() == 'The body of my title'
+
+
+def test_file_is_read_once(valid_text_path, dummy_target_path, mocker):
+    spy_open = mocker.spy(Path, 'open')
+    post = Post(valid_text_path, dummy_target_path)
+    post.content_hash
+    post.get_markdown_content()
+    assert spy_open.call_count == 1
 
 
 def test_invalid_initializer_1(invalid_text_path_1, dummy_target_path):
@@ -180,3 +189,17 @@ def test_equality(valid_text_path, dummy_target_path, tmp_path):
     post_different_dummy_target_path = Post(valid_text_path, tmp_path / 'another_dummy_target.html')
     assert post != post_different_dummy_target_path
     assert post == post_another_instance
+
+
+def test_summarize(valid_text_path, dummy_target_path):
+    summary = Post(valid_text_path, dummy_target_path).summarize()
+    assert summary == PostSummary('My first post', dt.date(2022, 12, 11), ['lifestyle', 'manana'], dummy_target_path, True,
+                                  {'another_label': 'another_value', 'paco': 'perfume', 'weird_label': 'sola'})
+    assert summary.paco == 'perfume'
+    with pytest.raises(AttributeError):
+        summary.not_a_label
+
+
+def test_summary_pickle(valid_text_path, dummy_target_path):
+    summary = Post(valid_text_path, dummy_target_path).summarize()
+    assert pickle.loads(pickle.dumps(summary)) == summary
@@ -0,0 +1,18 @@
+import datetime as dt
+
+from yabi.post_dates import PostDates
+
+
+def test_first_seen_dates_are_kept(tmp_path):
+    dates_path = tmp_path / 'dates.json'
+    post_dates = PostDates(dates_path)
+    post_dates.load()
+    assert post_dates.get_first_seen_date('a_post.md') == dt.date.today()
+    post_dates.save({'a_post.md'})
+
+    dates_path.write_text('{"a_post.md": "2020-01-01", "deleted_post.md": "2020-01-02"}')
+    post_dates = PostDates(dates_path)
+    post_dates.load()
+    assert post_dates.get_first_seen_date('a_post.md') == dt.date(2020, 1, 1)
+    post_dates.save({'a_post.md'})
+    assert dates_path.read_text() == '{\n "a_post.md": "2020-01-01"\n}'
@@ -0,0 +1,33 @@
+import datetime as dt
+from pathlib import Path
+
+import pytest
+
+from yabi.post import PostSummary
+from yabi.post_index import PostIndex
+
+
+@pytest.fixture()
+def posts() -> list[PostSummary]:
+    dates_and_tags = [(dt.date(2021, 11, 3), ['blog']), (dt.date(2022, 1, 5), ['blog', 'python']),
+                      (dt.date(2022, 1, 20), ['python']), (dt.date(2022, 3, 1), ['blog'])]
+    return [PostSummary(f'Post {idx}', date, tags, Path(f'post_{idx}.html'), draft=False)
+            for idx, (date, tags) in enumerate(dates_and_tags)]
+
+
+def test_posts_are_sorted_by_date(posts):
+    post_index = PostIndex(posts)
+    assert post_index.posts == [posts[3], posts[2], posts[1], posts[0]]
+
+
+def test_group_by_tag(posts):
+    post_index = PostIndex(posts)
+    assert post_index.tags() == ['blog', 'python']
+    assert post_index.by_tag['blog'] == [posts[3], posts[1], posts[0]]
+    assert post_index.by_tag['python'] == [posts[2], posts[1]]
+
+
+def test_months_by_year(posts):
+    post_index = PostIndex(posts)
+    assert post_index.months_by_year() == {2022: [('January', [posts[2], posts[1]]), ('March', [posts[3]])],
+                                           2021: [('November', [posts[0]])]}
@@ -0,0 +1,33 @@
+import json
+
+from yabi.profiling import BuildProfiler
+
+
+def test_measure_phases():
+    profiler = BuildProfiler()
+    with profiler.measure('a phase', count=3):
+        pass
+    assert list(profiler.measure_iterable('another phase', range(5))) == list(range(5))
+
+    assert profiler.phases['a phase'][1] == 3
+    assert profiler.phases['another phase'][1] == 5
+
+
+def test_merge_and_report(tmp_path):
+    profiler = BuildProfiler()
+    profiler.add('markdown conversion', 0.5)
+    profiler.add_post('slow_post.md', 0.5)
+    worker_profiler = BuildProfiler()
+    worker_profiler.add('markdown conversion', 0.25, count=2)
+    worker_profiler.add_post('fast_post.md', 0.25)
+    worker_profiler.add_template('post.html', 0.1)
+
+    profiler.merge(worker_profiler)
+
+    report_path = tmp_path / 'report.json'
+    with report_path.open('w') as file:
+        profiler.print_report('json', file)
+    report = json.loads(report_path.read_text())
+    assert report['phases'] == {'markdown conversion': {'seconds': 0.75, 'count': 3}}
+    assert report['slowest_posts'] == [['slow_post.md', 0.5], ['fast_post.md', 0.25]]
+    assert report['slowest_templates'] == [['post.html', 0.1]]
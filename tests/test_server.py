@@ -0,0 +1,85 @@
+import gzip
+import http.client
+import threading
+
+import pytest
+
+from yabi.server import StaticFileCache, create_server
+
+
+@pytest.fixture
+def server_connection(tmp_path):
+    (tmp_path / 'index.html').write_text('<p>home</p>' * 100)
+    (tmp_path / 'posts').mkdir()
+    (tmp_path / 'posts' / 'post.html').write_text('<p>post</p>')
+    server = create_server(tmp_path, 'localhost', 0)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    connection = http.client.HTTPConnection('localhost', server.server_address[1], timeout=5)
+    yield connection
+    connection.close()
+    server.shutdown()
+    server.server_close()
+
+
+def _get(connection, path, **headers):
+    connection.request('GET', path, headers=headers)
+    response = connection.getresponse()
+    return response, response.read()
+
+
+def test_conditional_requests(server_connection):
+    response, content = _get(server_connection, '/posts/post.html')
+    assert (response.status, content) == (200, b'<p>post</p>')
+    etag = response.getheader('ETag')
+    last_modified = response.getheader('Last-Modified')
+
+    # The same connection is reused for every request
+    response, content = _get(server_connection, '/posts/post.html', **{'If-None-Match': etag})
+    assert (response.status, content) == (304, b'')
+    response, content = _get(server_connection, '/posts/post.html', **{'If-Modified-Since': last_modified})
+    assert (response.status, content) == (304, b'')
+    response, _ = _get(server_connection, '/posts/post.html', **{'If-None-Match': '"other"'})
+    assert response.status == 200
+
+
+def test_compressed_content(server_connection):
+    response, content = _get(server_connection, '/', **{'Accept-Encoding': 'gzip'})
+    assert response.getheader('Content-Encoding') == 'gzip'
+    assert gzip.decompress(content) == b'<p>home</p>' * 100
+
+    response, content = _get(server_connection, '/', **{'Accept-Encoding': 'gzip;q=0'})
+    assert response.getheader('Content-Encoding') is None
+    assert content == b'<p>home</p>' * 100
+
+    response, _ = _get(server_connection, '/missing.html')
+    assert response.status == 404
+
+
+def test_served_file_changes(tmp_path, server_connection):
+    _get(server_connection, '/posts/post.html')
+    (tmp_path / 'posts' / 'post.html').write_text('<p>new post</p>')
+    _, content = _get(server_connection, '/posts/post.html')
+    assert content == b'<p>new post</p>'
+
+
+def test_file_cache_evicts_least_recently_served_files(tmp_path):
+    file_cache = StaticFileCache(max_size=250)
+    for name in ('a', 'b', 'c'):
+        (tmp_path / name).write_bytes(b'x' * 100)
+    file_cache.get(tmp_path / 'a', 'text/plain')
+    file_cache.get(tmp_path / 'b', 'text/plain')
+    cached_file = file_cache.get(tmp_path / 'a', 'text/plain')
+    file_cache.get(tmp_path / 'c', 'text/plain')
+    assert len(file_cache) == 2 and file_cache.size == 200
+    assert file_cache.get(tmp_path / 'a', 'text/plain') is cached_file
+
+
+def test_file_cache_drops_deleted_files(tmp_path):
+    file_cache = StaticFileCache()
+    (tmp_path / 'a').write_bytes(b'x' * 100)
+    file_cache.get(tmp_path / 'a', 'text/plain')
+    (tmp_path / 'a').unlink()
+    with pytest.raises(FileNotFoundError):
+        file_cache.get(tmp_path / 'a', 'text/plain')
+    assert len(file_cache) == 0 and file_cache.size == 0
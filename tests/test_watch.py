@@ -0,0 +1,94 @@
+import shutil
+import time
+
+import pytest
+
+from yabi.watch import EventWatcher, Watcher
+
+
+@pytest.fixture()
+def watched_dir(tmp_path):
+    (tmp_path / 'sub').mkdir()
+    (tmp_path / 'sub' / 'a_file.md').write_text('a')
+    return tmp_path
+
+
+def test_poll_detects_changes(watched_dir):
+    watcher = Watcher([watched_dir])
+    assert watcher.poll() == set()
+
+    (watched_dir / 'sub' / 'a_file.md').write_text('a modification')
+    (watched_dir / 'new_file.md').write_text('b')
+    assert watcher.poll() == {watched_dir / 'sub' / 'a_file.md', watched_dir / 'new_file.md'}
+
+    (watched_dir / 'new_file.md').unlink()
+    assert watcher.poll() == {watched_dir / 'new_file.md'}
+
+
+def test_watch_single_file(watched_dir):
+    watched_file = watched_dir / 'sub' / 'a_file.md'
+    watcher = Watcher([watched_file])
+    (watched_dir / 'ignored_file.md').write_text('b')
+    watched_file.write_text('a modification')
+    assert watcher.wait_for_changes() == {watched_file}
+
+
+def test_poll_detects_changes_in_new_and_deleted_directories(watched_dir):
+    watcher = Watcher([watched_dir])
+    (watched_dir / 'new_dir' / 'sub').mkdir(parents=True)
+    (watched_dir / 'new_dir' / 'sub' / 'b_file.md').write_text('b')
+    assert watcher.poll() == {watched_dir / 'new_dir' / 'sub' / 'b_file.md'}
+
+    shutil.rmtree(watched_dir / 'sub')
+    assert watcher.poll() == {watched_dir / 'sub' / 'a_file.md'}
+    assert watcher.poll() == set()
+
+
+def test_poll_interval_grows_with_the_poll_duration(watched_dir):
+    watcher = Watcher([watched_dir], poll_interval=0.05)
+    watcher.poll_duration = 0.001
+    assert watcher.get_poll_interval() == 0.05
+    watcher.poll_duration = 0.02
+    assert watcher.get_poll_interval() == pytest.approx(0.02 / Watcher.MAX_POLLING_LOAD)
+
+
+def test_event_watcher_detects_changes(watched_dir):
+    pytest.importorskip('watchdog')
+    watched_file = watched_dir / 'config.json'
+    watcher = EventWatcher([watched_dir / 'sub', watched_file])
+    try:
+        (watched_dir / 'ignored_file.md').write_text('b')
+        (watched_dir / 'sub' / 'a_file.md').write_text('a modification')
+        watched_file.write_text('{}')
+        changed_paths = watcher.wait_for_changes()
+        changed_paths |= watcher.poll()
+        assert changed_paths == {watched_dir / 'sub' / 'a_file.md', watched_file}
+    finally:
+        watcher.stop()
+
+
+def test_poll_detects_changes_in_directory_created_later(watched_dir):
+    templates_path = watched_dir / 'data' / 'templates'
+    watcher = Watcher([templates_path])
+    templates_path.mkdir(parents=True)
+    (templates_path / 'post.html').write_text('a')
+    assert watcher.poll() == {templates_path / 'post.html'}
+
+    (templates_path / 'post.html').write_text('a modification')
+    assert watcher.poll() == {templates_path / 'post.html'}
+
+
+def test_event_watcher_detects_changes_in_directory_created_later(watched_dir):
+    pytest.importorskip('watchdog')
+    templates_path = watched_dir / 'data' / 'templates'
+    watcher = EventWatcher([templates_path])
+    try:
+        templates_path.mkdir(parents=True)
+        time.sleep(0.1)  # for the new directory to be watched
+        (templates_path / 'post.html').write_text('a')
+        assert templates_path / 'post.html' in watcher.wait_for_changes()
+
+        (templates_path / 'post.html').write_text('a modification')
+        assert watcher.wait_for_changes() == {templates_path / 'post.html'}
+    finally:
+        watcher.stop()
@@ -0,0 +1,54 @@
+import os
+
+import pytest
+
+from yabi.writer import OutputWriter
+
+
+def test_write_skips_unchanged_files(tmp_path):
+    target_path = tmp_path / 'page.html'
+    writer = OutputWriter(tmp_path)
+    writer.write(target_path, '<p>content</p>')
+    assert target_path.read_text() == '<p>content</p>'
+    os.utime(target_path, (0, 0))
+
+    writer.write(target_path, '<p>content</p>')
+    assert target_path.stat().st_mtime == 0
+
+    writer.write(target_path, '<p>new content</p>')
+    assert target_path.read_text() == '<p>new content</p>'
+    assert (writer.written, writer.skipped) == (2, 1)
+    assert list(tmp_path.iterdir()) == [target_path]
+
+
+def test_write_uses_previous_output(tmp_path):
+    target_path = tmp_path / 'page.html'
+    writer = OutputWriter(tmp_path)
+    writer.write(target_path, 'same size 1')
+    previous_output = writer.outputs['page.html']
+
+    writer.write(target_path, 'same size 2', previous_output)
+    assert target_path.read_text() == 'same size 2'
+
+    os.utime(target_path, (0, 0))
+    writer.write(target_path, 'same size 2', writer.outputs['page.html'])
+    assert target_path.stat().st_mtime == 0
+
+
+def test_threaded_write_creates_directories(tmp_path):
+    writer = OutputWriter(tmp_path)
+    target_paths = [tmp_path / f'year_{idx % 3}' / 'month' / f'page_{idx}.html' for idx in range(50)]
+    with writer.threaded(4):
+        for idx, target_path in enumerate(target_paths):
+            writer.write(target_path, f'page {idx}')
+    assert all(target_path.read_text() == f'page {idx}' for idx, target_path in enumerate(target_paths))
+    assert (writer.written, writer.skipped) == (50, 0)
+    assert len(writer.outputs) == 50
+
+
+def test_threaded_write_raises_errors(tmp_path):
+    (tmp_path / 'file').write_text('not a directory')
+    writer = OutputWriter(tmp_path)
+    with pytest.raises(OSError):
+        with writer.threaded(2):
+            writer.write(tmp_path / 'file' / 'page.html', 'content')
@@ -1,15 +1,27 @@
-import calendar
 import datetime as dt
+import hashlib
 import json
 import shutil
 import sys
-from collections.abc import Iterator
-from importlib import resources
+import time
+from collections.abc import Callable, Iterable, Iterator
 from pathlib import Path
+from typing import TYPE_CHECKING
 
-from jinja2 import Environment, PackageLoader
+from yabi import minify
+from yabi.cache import FragmentCache, MetadataCache
+from yabi.compression import compress_files, get_compressors, is_compressible
+from yabi.manifest import BuildManifest, diff_outputs, hash_file
+from yabi.post import Post, PostSummary
+from yabi.post_dates import PostDates
+from yabi.post_index import PostIndex
+from yabi.profiling import BuildProfiler
+from yabi.shard import ShardSummary, is_in_shard
+from yabi.writer import OutputWriter
 
-from yabi.post import Post
+if TYPE_CHECKING:  # jinja2 and markdown are only imported once needed, as they are slow to import
+    import markdown
+    from jinja2 import Environment, Template
 
 
 class Blog:
@@ -29,7 +41,15 @@ class Blog:
     CSS_FILE_NAME = 'style.css'
     CONFIG_FILE_NAME = 'config.json'
     LAST_BUILD_FILE_NAME = '.yabi_last_build'
-    HOME_MAX_POSTS = 10
+    MANIFEST_FILE_NAME = '.yabi_manifest.json'
+    DEPLOY_MANIFEST_FILE_NAME = 'deploy_manifest.json'
+    METADATA_CACHE_FILE_NAME = '.yabi_cache.sqlite'
+    TEMPLATE_CACHE_DIR_NAME = '.yabi_template_cache'
+    FRAGMENT_CACHE_DIR_NAME = '.yabi_fragment_cache'
+    POST_DATES_FILE_NAME = '.yabi_post_dates.json'
+    SHARDS_DIR_NAME = '.yabi_shards'
+    DEFAULT_POSTS_PER_PAGE = 10
+    POSTS_BATCH_SIZE = 256
 
     def __init__(self, main_path: Path):
         self.main_path = main_path.resolve().expanduser()
@@ -45,12 +65,43 @@ class Blog:
         self.style_sheets_path = self.data_path / self.STYLE_SHEET_DIR_NAME
         self.default_css_file_path = self.style_sheets_path / self.CSS_FILE_NAME
         self.last_build_file_path = self.main_path / self.LAST_BUILD_FILE_NAME
-
-        self.template_environment = Environment(loader=PackageLoader('yabi'), trim_blocks=True, lstrip_blocks=True)
-        self.template_environment.globals.update({'current_year': f'{dt.date.today().year}',
-                                                  'website_path': self.website_path})
+        self.manifest = BuildManifest(self.main_path / self.MANIFEST_FILE_NAME)
+        self.deploy_manifest_path = self.main_path / self.DEPLOY_MANIFEST_FILE_NAME
+        self.shards_path = self.main_path / self.SHARDS_DIR_NAME
+        self._post_entries: dict[str, dict] = {}
+        self._page_signatures: dict[str, str] = {}
+        self.profiler = BuildProfiler()
+        self.writer = OutputWriter(self.website_path)
+        self.metadata_cache = MetadataCache(self.main_path / self.METADATA_CACHE_FILE_NAME)
+        self.fragment_cache = FragmentCache(self.main_path / self.FRAGMENT_CACHE_DIR_NAME)
+        self.post_dates = PostDates(self.main_path / self.POST_DATES_FILE_NAME)
+
+        self.template_cache_path = self.main_path / self.TEMPLATE_CACHE_DIR_NAME
+
+        self._template_environment: 'Environment | None' = None
+        self._template_globals = {'current_year': f'{dt.date.today().year}', 'website_path': self.website_path}
+        self._templates: dict[str, 'Template'] = {}
+        self.markdown_extensions: list[str] = []
+        self._markdown_converter: 'markdown.Markdown | None' = None
+        self.precompress = False
+        self.minify = False
+        self.posts_per_page = self.DEFAULT_POSTS_PER_PAGE
+        self.stable_pagination = False
         self.config_path = main_path / self.CONFIG_FILE_NAME
 
+    @property
+    def template_environment(self) -> 'Environment':
+        """ The environment is only created once a template is needed """
+        if self._template_environment is None:
+            from jinja2 import ChoiceLoader, Environment, FileSystemBytecodeCache, FileSystemLoader, PackageLoader
+
+            # Templates on the data directory of the blog override the default ones of the package
+            loader = ChoiceLoader([FileSystemLoader(self.templates_path), PackageLoader('yabi')])
+            self._template_environment = Environment(loader=loader, bytecode_cache=FileSystemBytecodeCache(self.template_cache_path),
+                                                     trim_blocks=True, lstrip_blocks=True)
+            self._template_environment.globals.update(self._template_globals)
+        return self._template_environment
+
     def create(self):
         if self.is_blog():
             print(f'Error! Input path {self.main_path.resolve()} seems to contain another yabi blog')
@@ -66,30 +117,186 @@ class Blog:
         self._save_default_config()
 
     def load_config(self):
-        """ Loads the config file and applies the globals to the environment """
+        """ Loads the config file and applies the globals to the environment. It marks the start of a new build """
         with self.config_path.open() as file:
             json_encoded = file.read()
         config = json.loads(json_encoded)
-        self.template_environment.globals.update(config)
+        self._template_globals.update(config)
+        if self._template_environment is not None:
+            self._template_environment.globals.update(config)
+        self.markdown_extensions = config.get('markdown_extensions', [])
+        self._markdown_converter = None
+        self.precompress = config.get('precompress', False)
+        self.minify = config.get('minify', False)
+        self.posts_per_page = config.get('posts_per_page', self.DEFAULT_POSTS_PER_PAGE)
+        if not isinstance(self.posts_per_page, int) or self.posts_per_page < 1:
+            raise ValueError(f'The "posts_per_page" entry of the {self.CONFIG_FILE_NAME} file must be a positive integer')
+        self.stable_pagination = config.get('stable_pagination', False)
+        self._templates = {}  # templates are looked up again on each build, as they could have been modified
+        self._post_entries = {}
+        self._page_signatures = {}
+        self.profiler = BuildProfiler()
+        self.writer = OutputWriter(self.website_path)
 
     def create_base_website(self):
         self.website_path.mkdir(exist_ok=True)
         self.website_posts_path.mkdir(exist_ok=True)
         self.website_tags_path.mkdir(exist_ok=True)
         self.website_archive_path.mkdir(exist_ok=True)
-        shutil.copy(self.default_css_file_path, self.website_path)
+        css = self.default_css_file_path.read_text()
+        if self.minify:
+            css = self._minify(css, 'css')
+        # An unchanged style sheet is not rewritten, so that its modification time is kept
+        self.writer.write(self.website_path / self.CSS_FILE_NAME, css, self.manifest.outputs.get(self.CSS_FILE_NAME))
 
     def update_last_build_file(self):
         """ Updates the modification time of the "last build" file which keeps track of the last build time"""
         self.last_build_file_path.touch(exist_ok=True)
 
     def is_config_file_updated(self) -> bool:
-        if not self.last_build_file_path.exists():
+        if self.manifest.config_hash is not None:
+            return self.manifest.config_hash != hash_file(self.config_path)
+        elif not self.last_build_file_path.exists():
             self.update_last_build_file()
             return True
         else:
             return self.config_path.stat().st_mtime > self.last_build_file_path.stat().st_mtime
 
+    def are_templates_updated(self) -> bool:
+        """ Checks whether any template changed since the last build. Without a previous record nothing is assumed """
+        return bool(self.manifest.template_hashes) and self.manifest.template_hashes != self.get_template_hashes()
+
+    def is_post_dirty(self, post: Post) -> bool:
+        """
+        Checks whether the post needs to be rebuilt by comparing its content against the last build manifest. Posts
+        without a record on the manifest fall back to a comparison of modification times
+        """
+        entry = self.manifest.posts.get(self._get_post_key(post.source_path))
+        if entry is None:
+            return post.is_dirty(post.target_path)
+        return entry['hash'] != post.content_hash or not post.target_path.exists()
+
+    def record_post(self, post: Post):
+        """ Records the current state of a post. The recorded posts are the ones saved with the manifest """
+        outputs = [post.target_path.relative_to(self.website_path).as_posix()] if post.is_public() else []
+        self._post_entries[self._get_post_key(post.source_path)] = BuildManifest.make_post_entry(post.content_hash,
+                                                                                                 post.serialize_metadata(), outputs)
+
+    def are_listings_outdated(self) -> bool:
+        """ Checks whether a post has been added, deleted or had its metadata changed since the last build """
+        if self._post_entries.keys() != self.manifest.posts.keys():
+            return True
+        return any(entry['metadata'] != self.manifest.posts[key]['metadata'] for key, entry in self._post_entries.items())
+
+    def invalidate_listing_pages(self):
+        """ Forgets the listing pages of the last build so that all of them are rendered again """
+        self.manifest.pages = {}
+
+    def update_manifest(self):
+        """ Saves the current state of the blog on the build manifest. It is only written if something changed """
+        posts = self._post_entries
+        config_hash = hash_file(self.config_path)
+        template_hashes = self.get_template_hashes()
+        pages = self._page_signatures or self.manifest.pages  # the listing pages are either all rendered or none
+        outputs = {key: output for key, output in {**self.manifest.outputs, **self.writer.outputs}.items()
+                   if key not in self.writer.deleted}
+        self._save_deploy_manifest(outputs)
+
+        if (posts, config_hash, template_hashes, pages, outputs) != (self.manifest.posts, self.manifest.config_hash,
+                                                                     self.manifest.template_hashes, self.manifest.pages,
+                                                                     self.manifest.outputs):
+            self.manifest.posts = posts
+            self.manifest.config_hash = config_hash
+            self.manifest.template_hashes = template_hashes
+            self.manifest.pages = pages
+            self.manifest.outputs = outputs
+            self.manifest.save()
+
+    def _save_deploy_manifest(self, outputs: dict[str, list]):
+        """
+        Saves the list of all the output files, with their hashes and sizes, along with the files added, changed and
+        deleted by the current build. Deploy scripts can then upload only what changed
+        """
+        deploy_manifest = {'files': {key: {'hash': content_hash, 'size': size} for key, (content_hash, size) in outputs.items()},
+                           **diff_outputs(self.manifest.outputs, outputs, self.writer.deleted)}
+        self.deploy_manifest_path.write_text(json.dumps(deploy_manifest, indent=1, sort_keys=True))
+
+    def is_post_in_shard(self, source_path: Path, shard_index: int, shard_count: int) -> bool:
+        return is_in_shard(self._get_post_key(source_path), shard_index, shard_count)
+
+    def save_shard_summary(self, shard_index: int, shard_count: int) -> Path:
+        """ Saves the summary of the posts recorded, and the files written, by the build of a shard """
+        summary = ShardSummary(self.shards_path / ShardSummary.get_file_name(shard_index, shard_count), shard_index, shard_count)
+        summary.config_hash = hash_file(self.config_path)
+        summary.template_hashes = self.get_template_hashes()
+        summary.posts = self._post_entries
+        summary.outputs = self.writer.outputs
+        summary.save()
+        return summary.path
+
+    def merge_shard_summaries(self) -> list[PostSummary]:
+        """
+        Records the posts and the output files of all the shards as if they were built on this build. Returns the
+        summaries of the public posts, as needed by the listing pages. The shards have to be complete and built with the
+        current config file and templates
+        """
+        summaries = []
+        for summary_path in sorted(self.shards_path.glob('shard_*.json')):
+            summary = ShardSummary(summary_path)
+            summary.load()
+            summaries.append(summary)
+        if not summaries:
+            raise ValueError(f'No shard summaries found on {self.shards_path}')
+        shard_count = summaries[0].shard_count
+        shards = sorted((summary.shard_index, summary.shard_count) for summary in summaries)
+        if shards != [(shard_index, shard_count) for shard_index in range(1, shard_count + 1)]:
+            raise ValueError(f'Expected the summaries of the shards 1 to {shard_count} on {self.shards_path}, found: '
+                             f'{", ".join(summary.path.name for summary in summaries)}')
+
+        config_hash = hash_file(self.config_path)
+        template_hashes = self.get_template_hashes()
+        for summary in summaries:
+            if summary.config_hash != config_hash or summary.template_hashes != template_hashes:
+                raise ValueError(f'The shard {summary.shard_index}/{shard_count} was built with another config file or templates')
+            self._post_entries.update(summary.posts)
+            for key, (content_hash, size) in summary.outputs.items():
+                self.writer.record(self.website_path / key, content_hash, size)
+
+        # The summaries have to match the posts on disk, as a summary left over by a previous sharded build would publish
+        # a deleted or outdated post. Unchanged posts are hashed only once, thanks to the metadata cache
+        content_hashes = {self._get_post_key(post.source_path): post.content_hash
+                          for post in self.iter_posts(self.markdown_post_paths())}
+        missing_keys = content_hashes.keys() - self._post_entries.keys()
+        if missing_keys:
+            raise ValueError(f'The following post(s) were not built by any shard: {", ".join(sorted(missing_keys))}')
+        deleted_keys = self._post_entries.keys() - content_hashes.keys()
+        if deleted_keys:
+            raise ValueError(f'The following post(s) built by the shards do not exist anymore: {", ".join(sorted(deleted_keys))}')
+        changed_keys = [key for key, content_hash in sorted(content_hashes.items()) if self._post_entries[key]['hash'] != content_hash]
+        if changed_keys:
+            raise ValueError(f'The following post(s) changed after being built by the shards: {", ".join(changed_keys)}')
+
+        public_posts = []
+        for key, entry in self._post_entries.items():
+            source_path = self.posts_path / key
+            post = Post(source_path, self.get_post_target_html_path(source_path),
+                        Post.deserialize_metadata(entry['metadata']), entry['hash'])
+            if post.is_public():
+                public_posts.append(post.summarize())
+        return public_posts
+
+    def clear_shard_summaries(self):
+        """ Deletes the summaries once merged, so that they are never merged again with the ones of a later build """
+        shutil.rmtree(self.shards_path, ignore_errors=True)
+
+    def get_template_hashes(self) -> dict[str, str]:
+        loader = self.template_environment.loader
+        hashes = {}
+        for template_name in loader.list_templates():
+            source, _, _ = loader.get_source(self.template_environment, template_name)
+            hashes[template_name] = hashlib.sha256(source.encode()).hexdigest()
+        return hashes
+
     def is_blog(self) -> bool:
         """ Checks whether the current directory is a yabi blog, i.e., it has the relevant paths"""
         if self.posts_path.exists() and self.data_path.exists() and self.config_path.exists():
@@ -97,64 +304,132 @@ class Blog:
         else:
             return False
 
-    def build_home_page(self, all_posts: list[Post]):
-        index_template = self.template_environment.get_template(self.INDEX_TEMPLATE)
+    def build_home_page(self, post_index: PostIndex):
+        index_template = self._get_template(self.INDEX_TEMPLATE)
         pagination_base_path = self.website_path / 'index'
-        for actual_index, previous_page, next_page, target_path, page_posts in self._iter_posts_pagination(all_posts, pagination_base_path):
-            index_html = index_template.render(latest_posts=page_posts, index=actual_index,
-                                               previous_page=previous_page, next_page=next_page)
-            target_path.write_text(index_html)
+        for actual_index, previous_page, next_page, target_path, page_posts in self._iter_posts_pagination(post_index.posts,
+                                                                                                           pagination_base_path):
+            self._write_listing_page(index_template, target_path, latest_posts=page_posts, index=actual_index,
+                                     previous_page=previous_page, next_page=next_page)
 
-    def build_tag_page(self, all_posts: list[Post]):
-        all_tags = set([tag for post in all_posts for tag in post.tags])
-        grouped_posts = [(tag, [post for post in all_posts if tag in post.tags]) for tag in all_tags]
+    def build_tag_page(self, post_index: PostIndex):
+        grouped_posts = [(tag, post_index.by_tag[tag]) for tag in post_index.tags()]
 
-        tag_template = self.template_environment.get_template(self.TAG_TEMPLATE)
+        tag_template = self._get_template(self.TAG_TEMPLATE)
         for tag, group in grouped_posts:
             pagination_base_path = self.website_tags_path / f'{tag}'
             for actual_index, previous_page, next_page, target_path, page_posts in self._iter_posts_pagination(group,
                                                                                                                pagination_base_path):
-                tag_html = tag_template.render(tag=tag, latest_posts=page_posts, index=actual_index,
-                                               previous_page=previous_page, next_page=next_page)
-                target_path.write_text(tag_html)
+                self._write_listing_page(tag_template, target_path, tag=tag, latest_posts=page_posts, index=actual_index,
+                                         previous_page=previous_page, next_page=next_page)
 
         # Get font size increase depending on the amount of posts
         all_tags_with_sizes = [(tag, 100 + 0.5 * (len(posts))) for tag, posts in grouped_posts]
 
-        all_tags_template = self.template_environment.get_template(self.ALL_TAGS_TEMPLATE)
-        all_tags_html = all_tags_template.render(all_tags=all_tags_with_sizes)
+        all_tags_template = self._get_template(self.ALL_TAGS_TEMPLATE)
         target_path = self.website_path / f'tags.html'
-        target_path.write_text(all_tags_html)
-
-    def build_archive_page(self, all_posts: list[Post]):
-        all_months = list(set([(post.date.year, post.date.month) for post in all_posts]))
-        all_months.sort(key=lambda x: x[0] * 10 - x[1], reverse=True)
-        grouped_posts = {year: [] for year, _ in all_months}
-        for year, month in all_months:
-            month_tuple = (calendar.month_name[month],
-                           [post for post in all_posts if (year == post.date.year and month == post.date.month)])
-            grouped_posts[year].append(month_tuple)
-
-        archive_template = self.template_environment.get_template(self.ARCHIVE_TEMPLATE)
+        self._write_listing_page(all_tags_template, target_path, all_tags=all_tags_with_sizes)
+
+    def build_archive_page(self, post_index: PostIndex):
+        grouped_posts = post_index.months_by_year()
+
+        archive_template = self._get_template(self.ARCHIVE_TEMPLATE)
         for year in grouped_posts:
             year_path = self.website_archive_path / f'{year}'
-            year_path.mkdir(exist_ok=True)
             for month, group in grouped_posts[year]:
                 pagination_base_path = year_path / f'{month.lower()}'
                 for actual_index, previous_page, next_page, target_path, page_posts in self._iter_posts_pagination(group,
                                                                                                                    pagination_base_path):
-                    tag_html = archive_template.render(month=month, year=year, latest_posts=page_posts, index=actual_index,
-                                                       previous_page=previous_page, next_page=next_page)
-                    target_path.write_text(tag_html)
+                    self._write_listing_page(archive_template, target_path, month=month, year=year, latest_posts=page_posts,
+                                             index=actual_index, previous_page=previous_page, next_page=next_page)
 
-        all_archive_template = self.template_environment.get_template(self.ALL_ARCHIVE_TEMPLATE)
-        archive_html = all_archive_template.render(grouped_posts=grouped_posts)
+        all_archive_template = self._get_template(self.ALL_ARCHIVE_TEMPLATE)
         target_path = self.website_path / f'archive.html'
-        target_path.write_text(archive_html)
+        self._write_listing_page(all_archive_template, target_path, grouped_posts=grouped_posts)
 
     def markdown_post_paths(self) -> Iterator[Path]:
         return self.posts_path.rglob('*md')
 
+    def iter_posts(self, post_paths: Iterable[Path], parse_posts: Callable[[list[Path]], Iterable[Post]] | None = None,
+                   batch_size: int = POSTS_BATCH_SIZE, prune: bool = True) -> Iterator[Post]:
+        """
+        Streams the posts on the given paths. Unchanged posts are taken from the metadata cache without reading their
+        files. The rest are parsed in batches with the given function, which defaults to parsing them one by one on this
+        process. The order of the posts is not preserved. The cached entries and the first-seen dates of the posts not
+        on the given paths are deleted, unless pruning is disabled, e.g., when the paths are only the ones of a shard
+        """
+        if parse_posts is None:
+            parse_posts = self._parse_posts
+        self.metadata_cache.load()
+        self.post_dates.load()
+
+        existing_keys = set()
+        uncached_paths = {}
+        for source_path in self.profiler.measure_iterable('discovery', post_paths):
+            key = self._get_post_key(source_path)
+            existing_keys.add(key)
+            with self.profiler.measure('metadata cache'):
+                file_key = MetadataCache.get_file_key(source_path.stat())
+                cached_entry = self.metadata_cache.get(key, file_key)
+            if cached_entry:
+                serialized_metadata, content_hash, body_offset = cached_entry
+                # Same as get_post_target_html_path, from the key that is already relative to the posts path
+                target_path = self.website_posts_path / f'{key.removesuffix(source_path.suffix)}.html'
+                yield Post(source_path, target_path, Post.deserialize_metadata(serialized_metadata), content_hash, body_offset)
+            else:
+                uncached_paths[source_path] = file_key
+                if len(uncached_paths) >= batch_size:
+                    parsed_posts = self._parse_and_cache_posts(uncached_paths, parse_posts)
+                    yield from self.profiler.measure_iterable('metadata parsing', parsed_posts)
+                    uncached_paths = {}
+        parsed_posts = self._parse_and_cache_posts(uncached_paths, parse_posts)
+        yield from self.profiler.measure_iterable('metadata parsing', parsed_posts)
+
+        self.metadata_cache.save(existing_keys if prune else None)
+        self.post_dates.save(existing_keys if prune else None)
+
+    def stale_target_paths(self) -> Iterator[Path]:
+        """
+        Returns the output paths of the last build that the current build does not produce anymore, i.e., the pages of
+        deleted or unpublished posts and the listing pages of tags or months without posts. It is only a comparison
+        against the manifest, so it should be called once the current build is done. Without a manifest, the file
+        system is scanned for the pages of deleted posts
+        """
+        if not self.manifest.outputs:
+            yield from self.orphan_target_paths()
+            return
+        expected_outputs = {output for entry in self._post_entries.values() for output in entry['outputs']}
+        expected_outputs.update(self._page_signatures or self.manifest.pages)
+        expected_outputs.add(self.CSS_FILE_NAME)
+        if self.precompress:
+            sidecar_suffixes = list(get_compressors())
+            expected_outputs.update([f'{key}{suffix}' for key in expected_outputs if is_compressible(key)
+                                     for suffix in sidecar_suffixes])
+        for key in sorted(self.manifest.outputs.keys() - expected_outputs):
+            yield self.website_path / key
+
+    def precompress_outputs(self, threads: int) -> int:
+        """
+        Writes the compressed sidecars of the output files written on this build, e.g., all of them if the output folder
+        was deleted, and of the ones without a record of all their sidecars, e.g., when the precompression was just
+        enabled. Files written elsewhere and only recorded here, like the pages of a shard, keep the sidecars recorded
+        with them. Only the records are checked, so a no-op build does not touch the disk. It should be called once the
+        stale outputs are deleted. Returns the number of compressed files
+        """
+        sidecar_suffixes = list(get_compressors())
+        recorded_outputs = self.manifest.outputs.keys() | self.writer.outputs.keys()
+
+        def is_missing_sidecars(key: str) -> bool:
+            return (any(f'{key}{suffix}' not in recorded_outputs for suffix in sidecar_suffixes) and
+                    (self.website_path / key).exists())
+
+        changed_paths = [self.website_path / key for key in sorted(recorded_outputs - self.writer.deleted)
+                         if is_compressible(key) and (key in self.writer.written_keys or is_missing_sidecars(key))]
+        with self.profiler.measure('precompression', count=len(changed_paths)):
+            for sidecar_path, content_hash, size in compress_files(changed_paths, threads):
+                self.writer.record(sidecar_path, content_hash, size)
+        return len(changed_paths)
+
     def orphan_target_paths(self) -> Iterator[Path]:
         """ Returns the html paths of the current build that do not have a corresponding markdown path """
         for target_path in self.website_posts_path.rglob('*.html'):
@@ -163,50 +438,147 @@ class Blog:
                 yield target_path
 
     def build_post(self, post: Post):
-        post_template = self.template_environment.get_template(self.POST_TEMPLATE)
-        html_content = post.get_content_in_html()
-        html_page = post_template.render(post=post, content=html_content)
-        post.target_path.parent.mkdir(exist_ok=True)
-        post.target_path.write_text(html_page)
+        start_time = time.perf_counter()
+        post_template = self._get_template(self.POST_TEMPLATE)
+        html_content = self._convert_markdown(post.get_markdown_content())
+        html_page = self._render_template(post_template, post=post, content=html_content)
+        self._write_page(post.target_path, html_page)
+        self.profiler.add_post(str(post.source_path), time.perf_counter() - start_time)
 
     def get_post_target_html_path(self, post_path: Path) -> Path:
         """ Target paths are named with the same name of the input markdown file name """
         return self.website_posts_path / post_path.parent.relative_to(self.posts_path) / f'{post_path.stem}.html'
 
-    def _iter_posts_pagination(self, all_posts: list[Post], pagination_base_path: Path):
-        if len(all_posts) <= self.HOME_MAX_POSTS:  # special case when the list of post is small enough
-            actual_index = previous_page = next_page = None
-            target_path = pagination_base_path.with_suffix('.html')
-            yield actual_index, previous_page, next_page, target_path, all_posts
+    def _convert_markdown(self, markdown_text: str) -> str:
+        """ Converts to html, unless the same text was already converted with the same settings """
+        import markdown
+
+        key = FragmentCache.get_key(markdown_text, [markdown.__version__, self.markdown_extensions])
+        with self.profiler.measure('fragment cache'):
+            html = self.fragment_cache.get(key)
+        if html is None:
+            with self.profiler.measure('markdown conversion'):
+                html = self._get_markdown_converter().reset().convert(markdown_text)
+            self.fragment_cache.put(key, html)
+        return html
+
+    def _get_markdown_converter(self) -> 'markdown.Markdown':
+        """ The converter, along with its extensions, is only created once and then reset between posts """
+        if self._markdown_converter is None:
+            import markdown
+
+            self._markdown_converter = markdown.Markdown(extensions=self.markdown_extensions)
+        return self._markdown_converter
+
+    def _get_template(self, template_name: str) -> 'Template':
+        """ Looks up each template only once per build """
+        if template_name not in self._templates:
+            self.template_cache_path.mkdir(exist_ok=True)  # where the compiled template is stored
+            self._templates[template_name] = self.template_environment.get_template(template_name)
+        return self._templates[template_name]
+
+    def _write_listing_page(self, template: 'Template', target_path: Path, **context):
+        """
+        Renders a listing page only if the data it depends on, i.e., the template context, changed since the last build.
+        The listing pages of a post are then only rebuilt when the post is added, deleted, or its metadata changes
+        """
+        key = target_path.relative_to(self.website_path).as_posix()
+        encoded_context = json.dumps([template.name, context], default=self._encode_page_context_value, sort_keys=True)
+        signature = hashlib.sha256(encoded_context.encode()).hexdigest()
+        self._page_signatures[key] = signature
+        if self.manifest.pages.get(key) == signature and target_path.exists():
             return
-        for idx, pos in enumerate(range(0, len(all_posts), self.HOME_MAX_POSTS)):
-            page_posts = all_posts[pos:pos + self.HOME_MAX_POSTS]
-            actual_index = idx + 1
-            if idx == 0:
-                target_path = pagination_base_path.with_suffix('.html')
-                if len(all_posts) < self.HOME_MAX_POSTS:
-                    actual_index = None
-                    previous_page = None
-                    next_page = None
-                else:
-                    pagination_base_path.mkdir(exist_ok=True)
-                    previous_page = None
-                    next_page = pagination_base_path / f'page_{actual_index + 1}.html'
-            else:
-                if idx == 1:
-                    previous_page = pagination_base_path.with_suffix('.html')
-                else:
-                    previous_page = pagination_base_path / f'page_{actual_index - 1}.html'
-                target_path = pagination_base_path / f'page_{actual_index}.html'
-                # TODO: if the number of post is a multiple of HOME_MAX_POSTS then the below condition will be never satisfied
-                if len(page_posts) < self.HOME_MAX_POSTS:
-                    next_page = None
-                else:
-                    next_page = pagination_base_path / f'page_{actual_index + 1}.html'
-
-            yield actual_index, previous_page, next_page, target_path, page_posts
+        self._write_page(target_path, self._render_template(template, **context))
+
+    def _render_template(self, template: 'Template', **context) -> str:
+        start_time = time.perf_counter()
+        html = template.render(**context)
+        elapsed_time = time.perf_counter() - start_time
+        self.profiler.add('template render', elapsed_time)
+        self.profiler.add_template(template.name, elapsed_time)
+        return html
+
+    def _write_page(self, target_path: Path, html: str):
+        if self.minify:
+            html = self._minify(html, 'html')
+        previous_output = self.manifest.outputs.get(target_path.relative_to(self.website_path).as_posix())
+        with self.profiler.measure('file write'):
+            self.writer.write(target_path, html, previous_output)
+
+    def _minify(self, text: str, file_type: str) -> str:
+        """ The minified text is cached, so that a page rendered exactly as on a previous build is not minified again """
+        key = FragmentCache.get_key(text, ['minify', file_type, minify.VERSION])
+        with self.profiler.measure('minification'):
+            minified_text = self.fragment_cache.get(key)
+            if minified_text is None:
+                minified_text = minify.minify_html(text) if file_type == 'html' else minify.minify_css(text)
+                self.fragment_cache.put(key, minified_text)
+        return minified_text
+
+    def _encode_page_context_value(self, value):
+        if isinstance(value, PostSummary):
+            return value.serialize()
+        elif isinstance(value, Path):
+            return value.as_posix()
+        raise TypeError(f'Cannot encode the page context value {value!r}')
+
+    def _parse_and_cache_posts(self, file_keys: dict[Path, tuple[int, int, int]],
+                               parse_posts: Callable[[list[Path]], Iterable[Post]]) -> Iterator[Post]:
+        for post in parse_posts(list(file_keys)):
+            key = self._get_post_key(post.source_path)
+            if post.is_date_missing:
+                post.set_default_date(self.post_dates.get_first_seen_date(key))
+            self.metadata_cache.put(key, file_keys[post.source_path], post.serialize_metadata(), post.content_hash,
+                                    post.body_offset)
+            yield post
+
+    def _parse_posts(self, post_paths: list[Path]) -> list[Post]:
+        return [Post(source_path, self.get_post_target_html_path(source_path)) for source_path in post_paths]
+
+    def _get_post_key(self, source_path: Path) -> str:
+        return source_path.relative_to(self.posts_path).as_posix()
+
+    def _iter_posts_pagination(self, all_posts: list[PostSummary], pagination_base_path: Path):
+        """
+        Splits the posts, sorted from the newest to the oldest, in pages. The newest page is the base path and the rest
+        are named by their number. Yields the number, the previous (newer) and next (older) page paths, the target path
+        and the posts of each page. If all the posts fit on a single page, it has no number
+        """
+        if self.stable_pagination:
+            pages = self._split_pages_from_oldest(all_posts)
+        else:
+            pages = [(idx + 1, all_posts[pos:pos + self.posts_per_page])
+                     for idx, pos in enumerate(range(0, len(all_posts), self.posts_per_page))]
+        if len(pages) <= 1:
+            yield None, None, None, pagination_base_path.with_suffix('.html'), all_posts
+            return
+
+        target_paths = [pagination_base_path.with_suffix('.html')]
+        target_paths.extend(pagination_base_path / f'page_{actual_index}.html' for actual_index, _ in pages[1:])
+        for idx, (actual_index, page_posts) in enumerate(pages):
+            previous_page = target_paths[idx - 1] if idx > 0 else None
+            next_page = target_paths[idx + 1] if idx + 1 < len(pages) else None
+            yield actual_index, previous_page, next_page, target_paths[idx], page_posts
+
+    def _split_pages_from_oldest(self, all_posts: list[PostSummary]) -> list[tuple[int, list[PostSummary]]]:
+        """
+        Numbers the pages from the oldest post, so that a new post only changes the newest page, and, once every
+        "posts_per_page" posts, adds a new page. The older pages stay the same. The newest page, which also takes the
+        posts that do not fill a whole page, has between one and two times the page size
+        """
+        number_of_full_pages = len(all_posts) // self.posts_per_page
+        if number_of_full_pages <= 1:
+            return [(1, all_posts)]
+        newest_page_size = len(all_posts) - (number_of_full_pages - 1) * self.posts_per_page
+        pages = [(number_of_full_pages, all_posts[:newest_page_size])]
+        for actual_index in range(number_of_full_pages - 1, 0, -1):
+            end = len(all_posts) - (actual_index - 1) * self.posts_per_page
+            pages.append((actual_index, all_posts[end - self.posts_per_page:end]))
+        return pages
 
     def _save_default_config(self):
+        from importlib import resources
+
         with resources.as_file(resources.files('yabi') / self.DATA_DIR_NAME) as data_directory:
             shutil.copytree(data_directory, self.data_path, dirs_exist_ok=True)
 
@@ -218,7 +590,12 @@ class Blog:
                   'website_author': '',
                   'website_description': '',
                   'website_keywords': '',
-                  'website_root': '/'
+                  'website_root': '/',
+                  'markdown_extensions': [],
+                  'precompress': False,
+                  'minify': False,
+                  'posts_per_page': self.DEFAULT_POSTS_PER_PAGE,
+                  'stable_pagination': False
                   }
         json_encoded = json.dumps(config)
         self.config_path.write_text(json_encoded)
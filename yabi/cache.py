@@ -0,0 +1,134 @@
+"""
+Persistent caches stored on the blog directory to avoid redoing work between builds
+"""
+import hashlib
+import json
+import os
+import tempfile
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:  # sqlite3 is only imported once the cache is used
+    import sqlite3
+
+
+class MetadataCache:
+    """
+    Keeps the parsed metadata, the content hash and the offset of the body of every post, keyed by the path of the post
+    relative to the posts directory. An entry is only valid while the size, modification time and inode of the file stay
+    the same, so an unchanged post can be loaded with a single stat call, and rendered later from its body, without
+    parsing the file again
+    """
+    VERSION = 1  # of the table schema. A cache written with another schema is discarded
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._entries: dict[str, tuple[tuple[int, int, int], str, str, int]] = {}
+        self._updated_entries: dict[str, tuple[tuple[int, int, int], str, str, int]] = {}
+
+    @staticmethod
+    def get_file_key(stat_result: os.stat_result) -> tuple[int, int, int]:
+        return stat_result.st_size, stat_result.st_mtime_ns, stat_result.st_ino
+
+    def load(self):
+        if not self.path.exists():
+            return
+        with self._connect() as connection:
+            rows = connection.execute('SELECT path, size, mtime_ns, inode, content_hash, metadata, body_offset FROM posts')
+            self._entries = {path: ((size, mtime_ns, inode), content_hash, metadata, body_offset)
+                             for path, size, mtime_ns, inode, content_hash, metadata, body_offset in rows}
+        connection.close()
+
+    def get(self, key: str, file_key: tuple[int, int, int]) -> tuple[dict, str, int] | None:
+        """
+        Returns the serialized metadata, the content hash and the offset of the body of a post if the cached entry is
+        still valid
+        """
+        entry = self._entries.get(key)
+        if entry is None or entry[0] != file_key:
+            return None
+        _, content_hash, metadata, body_offset = entry
+        return json.loads(metadata), content_hash, body_offset
+
+    def put(self, key: str, file_key: tuple[int, int, int], serialized_metadata: dict, content_hash: str, body_offset: int):
+        entry = (file_key, content_hash, json.dumps(serialized_metadata), body_offset)
+        self._entries[key] = entry
+        self._updated_entries[key] = entry
+
+    def save(self, existing_keys: set[str] | None = None):
+        """
+        Writes the updated entries and, if the existing posts are given, removes the ones of the posts that do not exist
+        anymore
+        """
+        deleted_keys = [(key,) for key in self._entries.keys() - existing_keys] if existing_keys is not None else []
+        if not self._updated_entries and not deleted_keys:
+            return
+        with self._connect() as connection:
+            connection.executemany('INSERT OR REPLACE INTO posts VALUES (?, ?, ?, ?, ?, ?, ?)',
+                                   [(key, *file_key, *entry) for key, (file_key, *entry) in self._updated_entries.items()])
+            connection.executemany('DELETE FROM posts WHERE path = ?', deleted_keys)
+        connection.close()
+        for (key,) in deleted_keys:
+            del self._entries[key]
+        self._updated_entries = {}
+
+    def _connect(self) -> 'sqlite3.Connection':
+        import sqlite3
+
+        connection = sqlite3.connect(self.path)
+        if connection.execute('PRAGMA user_version').fetchone()[0] != self.VERSION:
+            with connection:
+                connection.execute('DROP TABLE IF EXISTS posts')
+                connection.execute(f'PRAGMA user_version = {self.VERSION}')
+        connection.execute('CREATE TABLE IF NOT EXISTS posts (path TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER, '
+                           'inode INTEGER, content_hash TEXT, metadata TEXT, body_offset INTEGER)')
+        return connection
+
+
+class FragmentCache:
+    """
+    Content addressed cache of the html converted from the markdown body of the posts, and of the minified pages. The
+    html only depends on the source text and on the converter settings, so it can be reused even when the whole site is
+    rebuilt, e.g., after a change of the config file. Each fragment is a file on the cache directory. The least recently used fragments are
+    evicted once the cache is larger than its maximum size
+    """
+    DEFAULT_MAX_SIZE = 64 * 1024 * 1024  # in bytes
+
+    def __init__(self, path: Path, max_size: int = DEFAULT_MAX_SIZE):
+        self.path = path
+        self.max_size = max_size
+
+    @staticmethod
+    def get_key(markdown_text: str, settings: object) -> str:
+        """ The settings can be any JSON serializable object, e.g., the list of extensions of the converter """
+        encoded_settings = json.dumps(settings, sort_keys=True)
+        return hashlib.sha256(f'{encoded_settings}\n{markdown_text}'.encode()).hexdigest()
+
+    def get(self, key: str) -> str | None:
+        fragment_path = self.path / f'{key}.html'
+        try:
+            html = fragment_path.read_text()
+            os.utime(fragment_path)  # marks the fragment as recently used
+        except FileNotFoundError:
+            return None
+        return html
+
+    def put(self, key: str, html: str):
+        """ Writes through a temporary file so that concurrent builds never read a partial fragment """
+        self.path.mkdir(exist_ok=True)
+        with tempfile.NamedTemporaryFile('w', dir=self.path, suffix='.tmp', delete=False) as file:
+            file.write(html)
+        os.replace(file.name, self.path / f'{key}.html')
+
+    def prune(self):
+        """ Evicts the least recently used fragments until the cache fits on its maximum size """
+        if not self.path.exists():
+            return
+        fragments = [(fragment_path, fragment_path.stat()) for fragment_path in self.path.glob('*.html')]
+        total_size = sum(stat_result.st_size for _, stat_result in fragments)
+        fragments.sort(key=lambda fragment: fragment[1].st_mtime_ns)
+        for fragment_path, stat_result in fragments:
+            if total_size <= self.max_size:
+                break
+            fragment_path.unlink(missing_ok=True)
+            total_size -= stat_result.st_size
@@ -1,15 +1,32 @@
 import argparse
-import http.server
+import contextlib
+import itertools
+import json
 import os
-import socketserver
+import re
 import sys
+import threading
+import time
+from collections import deque
+from collections.abc import Iterable, Iterator
 from pathlib import Path
+from typing import TYPE_CHECKING
 
 from yabi.blog import Blog
-from yabi.post import Post
+from yabi.post import Post, PostSummary
+from yabi.post_index import PostIndex
+from yabi.profiling import BuildProfiler
+from yabi.watch import create_watcher
+from yabi.writer import OutputWriter
+
+if TYPE_CHECKING:  # the process pool is only imported when building with several jobs
+    from concurrent.futures import Executor
 
 DEFAULT_TEST_PORT = 9090
 DEFAULT_TEST_HOST = 'localhost'
+PENDING_BUILDS_PER_JOB = 8
+OUTPUT_WRITER_THREADS = 4
+MIN_POSTS_TO_CHECK_IN_PARALLEL = 64
 
 
 def parse_cli_arguments():
@@ -22,69 +39,371 @@ def parse_cli_arguments():
 
     parser_build = subparsers.add_parser('build', help='Builds the website')
     parser_build.add_argument('--force', help='Force a clean rebuild of the entire website', action='store_true')
+    parser_build.add_argument('--profile', help='Print the timings of each phase of the build, as text or as JSON',
+                              nargs='?', const='text', choices=['text', 'json'])
+    parser_build.add_argument('--profile-output', help='File where the profile report is written instead of the standard output',
+                              type=Path)
+    parser_build.add_argument('--jobs', '-j', help='Number of worker processes used to parse and render the posts',
+                              type=int, default=os.cpu_count() or 1)
+
+    parser_build.add_argument('--shard', help='Only render the posts of the shard K out of N, e.g., 2/4, to be merged later '
+                                              'with the "merge" subcommand', type=_parse_shard, metavar='K/N')
+
+    parser_merge = subparsers.add_parser('merge', help='Builds the listing pages from the posts rendered by all the shards of a '
+                                                       'sharded build')
+    parser_merge.add_argument('--profile', help='Print the timings of each phase of the merge, as text or as JSON',
+                              nargs='?', const='text', choices=['text', 'json'])
+    parser_merge.add_argument('--profile-output', help='File where the profile report is written instead of the standard output',
+                              type=Path)
+    parser_merge.add_argument('--jobs', '-j', help='Number of threads used to precompress the output files',
+                              type=int, default=os.cpu_count() or 1)
+
+    parser_check = subparsers.add_parser('check', help='Checks the metadata of all the posts, without building the website, '
+                                                       'and reports all the errors found')
+    parser_check.add_argument('--format', help='Format of the report, as text or as JSON', choices=['text', 'json'],
+                              default='text')
+    parser_check.add_argument('--jobs', '-j', help='Number of worker processes used to parse the posts',
+                              type=int, default=os.cpu_count() or 1)
 
-    subparsers.add_parser('test', help='Creates a local server to check the blog locally')
+    parser_serve = subparsers.add_parser('serve', aliases=['test'], help='Creates a local server to check the blog locally')
+    parser_serve.add_argument('--watch', help='Rebuild the website whenever a post, a template or the config file changes',
+                              action='store_true')
+    parser_serve.add_argument('--host', help=f'Address the server is bound to, e.g., 0.0.0.0 to be reachable from other machines '
+                                             f'(default: {DEFAULT_TEST_HOST})', default=DEFAULT_TEST_HOST)
+    parser_serve.add_argument('--port', help=f'Port of the server (default: {DEFAULT_TEST_PORT})', type=int,
+                              default=DEFAULT_TEST_PORT)
 
     return parser.parse_args()
 
 
+def _parse_shard(value: str) -> tuple[int, int]:
+    """ Parses a shard given as "K/N", i.e., the shard K out of N """
+    match = re.fullmatch(r'(\d+)/(\d+)', value)
+    if match is None or not 1 <= int(match.group(1)) <= int(match.group(2)):
+        raise argparse.ArgumentTypeError(f'invalid shard "{value}", expected K/N with 1 <= K <= N')
+    return int(match.group(1)), int(match.group(2))
+
+
 def init(path: Path):
     blog = Blog(path)
     blog.create()
     print(f'New yabi blog successfully created on {path.resolve()}!')
 
 
-def build(blog: Blog, force: bool):
+# Blog instance of each worker process of the build pool. Set by the pool initializer
+_worker_blog: Blog | None = None
+
+
+def _init_build_worker(main_path: Path):
+    global _worker_blog
+    _worker_blog = Blog(main_path)
+    _worker_blog.load_config()
+    _worker_blog.manifest.load()
+
+
+def _init_check_worker(main_path: Path):
+    """ Parsing the posts only needs the paths of the blog, so the config is not loaded, as it may be invalid """
+    global _worker_blog
+    _worker_blog = Blog(main_path)
+
+
+def _parse_post(source_path: Path) -> Post:
+    try:
+        post = Post(source_path, _worker_blog.get_post_target_html_path(source_path))
+        post.content_hash  # hash the content on the worker as well
+        return post
+    except Exception as error:
+        raise ValueError(f'Error while parsing the post {source_path}: {error}') from error
+
+
+def _check_post(source_path: Path, blog: Blog | None = None) -> tuple[Path, Post | None, str | None]:
+    """ Returns the parsed post, or the error found on it instead of raising it """
+    blog = blog or _worker_blog
+    try:
+        post = Post(source_path, blog.get_post_target_html_path(source_path))
+        post.content_hash  # hash the content on the worker as well
+        return source_path, post, None
+    except (OSError, ValueError) as error:
+        return source_path, None, str(error)
+
+
+def _build_post(post: Post) -> tuple[BuildProfiler, OutputWriter]:
+    """ Returns the measurements and the written outputs so that they are added to the ones of the main process """
+    _worker_blog.profiler = BuildProfiler()
+    _worker_blog.writer = OutputWriter(_worker_blog.website_path)
+    try:
+        _worker_blog.build_post(post)
+    except Exception as error:
+        raise ValueError(f'Error while building the post {post.source_path}: {error}') from error
+    return _worker_blog.profiler, _worker_blog.writer
+
+
+def _merge_worker_build(blog: Blog, worker_build: tuple[BuildProfiler, OutputWriter]):
+    profiler, writer = worker_build
+    blog.profiler.merge(profiler)
+    blog.writer.merge(writer)
+
+
+def _chunk_size(number_of_items: int, jobs: int) -> int:
+    """ Splits the work in a few chunks per worker to reduce the inter-process communication overhead """
+    return max(1, number_of_items // (jobs * 4))
+
+
+def _build_posts(blog: Blog, post_paths: Iterable[Path], force: bool, executor: 'Executor | None' = None,
+                 jobs: int = 1, prune: bool = True) -> tuple[list[PostSummary], int]:
+    """
+    Streams the posts through the parsing and rendering stages, optionally on a pool of workers. Only a summary of the
+    public posts is kept, as needed by the listing pages. Returns them along with the number of rendered posts. Pruning
+    has to be disabled if the paths are not all the posts, see Blog.iter_posts
+    """
+    public_posts = []
+    number_of_built_posts = 0
+    pending_builds = deque()
+    parse_posts = (lambda paths: executor.map(_parse_post, paths, chunksize=_chunk_size(len(paths), jobs))) if executor else None
+
+    for post in blog.iter_posts(post_paths, parse_posts, prune=prune):
+        blog.record_post(post)
+        if not post.is_public():
+            continue
+        if force or blog.is_post_dirty(post):
+            print(f'Building post {post.source_path}...')
+            if executor:
+                pending_builds.append(executor.submit(_build_post, post))
+                if len(pending_builds) > jobs * PENDING_BUILDS_PER_JOB:  # bounds the posts held in memory
+                    _merge_worker_build(blog, pending_builds.popleft().result())
+            else:
+                blog.build_post(post)
+            number_of_built_posts += 1
+        public_posts.append(post.summarize())
+
+    # Wait for the remaining builds. Any error raised on a worker is propagated here
+    for pending_build in pending_builds:
+        _merge_worker_build(blog, pending_build.result())
+    return public_posts, number_of_built_posts
+
+
+def build(blog: Blog, force: bool, jobs: int = 1, profile: str | None = None, profile_output: Path | None = None,
+          shard: tuple[int, int] | None = None):
+    """
+    If a profile format is given, a report with the timings of the build is printed at the end with this format, either
+    on the standard output or on the given file. If a shard, i.e., its index and the number of shards, is given, only
+    the posts of the shard are rendered, and a summary of them is saved instead of building the listing pages
+    """
+    start_time = time.perf_counter()
     blog.load_config()
-    all_public_posts = []
-    needs_rebuild = False
+    if shard is None:
+        blog.manifest.load()
 
-    if len(list(blog.markdown_post_paths())) == 0:
+    post_paths = blog.markdown_post_paths()
+    first_post_path = next(post_paths, None)
+    if first_post_path is None:
         print(f'Error: No markdown posts found under the path {blog.posts_path}')
         return 1
+    post_paths = itertools.chain([first_post_path], post_paths)
 
     blog.create_base_website()
 
-    if blog.is_config_file_updated() or force:
+    if shard is not None:
+        print(f'Building the shard {shard[0]}/{shard[1]}...')
+        post_paths = (source_path for source_path in post_paths if blog.is_post_in_shard(source_path, *shard))
+        force = True  # a shard does not keep the state of previous builds, so all its posts are rendered
+    elif blog.is_config_file_updated() or force:
         print(f'The config.json file has been modified. Rebuilding whole site...')
         force = True
+    elif blog.are_templates_updated():
+        print(f'The templates have been modified. Rebuilding whole site...')
+        force = True
 
-    for path in blog.markdown_post_paths():
-        target_path = blog.get_post_target_html_path(path)
-        post = Post(path, target_path)
-        all_public_posts.append(post)
-        if post.is_public() and (post.is_dirty(target_path) or force):
-            print(f'Building post {post.source_path}...')
-            blog.build_post(post)
-            if not needs_rebuild:
-                needs_rebuild = True
-
-    # Cleanup: If a post was deleted after it had been published, then we need to delete the corresponding html file.
-    for target_path in blog.orphan_target_paths():
-        print(f'Deleting orphan page: {target_path}')
-        target_path.unlink()
-
-    if force or needs_rebuild:
-        all_public_posts.sort(key=lambda x: x.date, reverse=True)
-        print(f'Building index...')
-        blog.build_home_page(all_public_posts)
-        print(f'Building tag pages...')
-        blog.build_tag_page(all_public_posts)
-        print(f'Building archive pages...')
-        blog.build_archive_page(all_public_posts)
-        print(f'Done!')
+    # The pages rendered on the main process are written on a pool of threads while the next ones are rendered
+    with blog.writer.threaded(OUTPUT_WRITER_THREADS):
+        if jobs > 1:
+            from concurrent.futures import ProcessPoolExecutor
+
+            # The workers are created from the same (unresolved) path as the blog so that all their target paths are identical
+            with ProcessPoolExecutor(max_workers=jobs, initializer=_init_build_worker, initargs=(blog.website_path.parent,)) as executor:
+                public_posts, number_of_built_posts = _build_posts(blog, post_paths, force, executor, jobs, prune=shard is None)
+        else:
+            public_posts, number_of_built_posts = _build_posts(blog, post_paths, force, prune=shard is None)
+
+        if number_of_built_posts > 0:
+            blog.fragment_cache.prune()
+        needs_rebuild = number_of_built_posts > 0 or blog.are_listings_outdated()
+
+        # The listing pages of a sharded build are built once all the shards are merged
+        if shard is None and (force or needs_rebuild):
+            if force:
+                blog.invalidate_listing_pages()
+            _build_listing_pages(blog, public_posts)
+        elif shard is None:
+            print('No new posts found!')
+
+    if shard is not None:
+        _precompress_outputs(blog, jobs)
+        summary_path = blog.save_shard_summary(*shard)
+        print(f'Done! Wrote {blog.writer.written} file(s) and skipped {blog.writer.skipped} unchanged file(s). The summary '
+              f'of the shard is saved on {summary_path}')
+    else:
+        _finish_build(blog, jobs, force or needs_rebuild)
+    _report_profile(blog, start_time, profile, profile_output)
+
+
+def merge(blog: Blog, jobs: int = 1, profile: str | None = None, profile_output: Path | None = None):
+    """
+    Completes a sharded build: the posts rendered by all the shards are recorded as if they were built here, and then
+    the listing pages are built from them
+    """
+    start_time = time.perf_counter()
+    blog.load_config()
+    blog.manifest.load()
+    try:
+        public_posts = blog.merge_shard_summaries()
+    except ValueError as error:
+        print(f'Error: {error}')
+        return 1
+    print(f'Merged {len(public_posts)} public post(s) from the shards on {blog.shards_path}')
+
+    blog.create_base_website()
+    if blog.is_config_file_updated() or blog.are_templates_updated():
+        blog.invalidate_listing_pages()
+    with blog.writer.threaded(OUTPUT_WRITER_THREADS):
+        _build_listing_pages(blog, public_posts)
+
+    _finish_build(blog, jobs, rebuilt=True)
+    blog.clear_shard_summaries()
+    _report_profile(blog, start_time, profile, profile_output)
+
+
+def check(blog: Blog, jobs: int = 1, output_format: str = 'text'):
+    """
+    Parses the config file and the metadata of all the posts without rendering anything, and reports all the errors at
+    once. Posts unchanged since they were last parsed are valid, so they are taken from the metadata cache, and the
+    posts parsed here are cached for the next build. Returns 1 if any error is found
+    """
+    errors = {}
+    try:
+        blog.load_config()
+    except ValueError as error:
+        errors[blog.config_path] = str(error)
+
+    number_of_posts = 0
+    with contextlib.ExitStack() as stack:
+        executor = None
+
+        def parse_posts(post_paths: list[Path]) -> Iterator[Post]:
+            nonlocal executor
+            # The pool is only started if there are enough posts to parse, e.g., not when most of them are cached
+            if executor is None and jobs > 1 and len(post_paths) >= MIN_POSTS_TO_CHECK_IN_PARALLEL:
+                from concurrent.futures import ProcessPoolExecutor
+
+                executor = stack.enter_context(ProcessPoolExecutor(max_workers=jobs, initializer=_init_check_worker,
+                                                                   initargs=(blog.website_path.parent,)))
+            if executor is not None:
+                results = executor.map(_check_post, post_paths, chunksize=_chunk_size(len(post_paths), jobs))
+            else:
+                results = (_check_post(source_path, blog) for source_path in post_paths)
+            for source_path, post, error in results:
+                if error is None:
+                    yield post
+                else:
+                    errors[source_path] = error
+
+        for _ in blog.iter_posts(blog.markdown_post_paths(), parse_posts):
+            number_of_posts += 1
+    number_of_posts += len(errors.keys() - {blog.config_path})
+
+    sorted_errors = [{'path': str(path), 'error': error} for path, error in sorted(errors.items())]
+    if output_format == 'json':
+        print(json.dumps({'posts': number_of_posts, 'errors': sorted_errors}, indent=2))
     else:
-        print('No new posts found!')
+        for error in sorted_errors:
+            print(f'Error: {error["path"]}: {error["error"]}')
+        print(f'Checked {number_of_posts} post(s), found {len(sorted_errors)} error(s)')
+    return 1 if errors else 0
 
-    if force or needs_rebuild:
+
+def _build_listing_pages(blog: Blog, public_posts: list[PostSummary]):
+    post_index = PostIndex(public_posts)
+    print(f'Building index...')
+    with blog.profiler.measure('index'):
+        blog.build_home_page(post_index)
+    print(f'Building tag pages...')
+    with blog.profiler.measure('tags', count=len(post_index.by_tag)):
+        blog.build_tag_page(post_index)
+    print(f'Building archive pages...')
+    with blog.profiler.measure('archive', count=len(post_index.by_month)):
+        blog.build_archive_page(post_index)
+
+
+def _precompress_outputs(blog: Blog, jobs: int):
+    if blog.precompress:
+        number_of_compressed_files = blog.precompress_outputs(jobs)
+        if number_of_compressed_files > 0:
+            print(f'Precompressed {number_of_compressed_files} file(s)')
+
+
+def _finish_build(blog: Blog, jobs: int, rebuilt: bool):
+    # Cleanup: Delete the pages of the posts deleted or unpublished since the last build, along with the listing pages
+    # that are not generated anymore
+    with blog.profiler.measure('orphan cleanup', count=0):
+        for target_path in blog.stale_target_paths():
+            print(f'Deleting orphan page: {target_path}')
+            blog.writer.delete(target_path)
+            blog.profiler.add('orphan cleanup', 0)
+
+    # After the cleanup, so that no sidecar is written for a deleted page
+    _precompress_outputs(blog, jobs)
+
+    if rebuilt:
         blog.update_last_build_file()
+        print(f'Done! Wrote {blog.writer.written} file(s), skipped {blog.writer.skipped} unchanged file(s) and deleted '
+              f'{len(blog.writer.deleted)} file(s)')
+    blog.update_manifest()
+
 
+def _report_profile(blog: Blog, start_time: float, profile: str | None, profile_output: Path | None):
+    blog.profiler.add('total', time.perf_counter() - start_time)
+    if profile and profile_output:
+        with profile_output.open('w') as file:
+            blog.profiler.print_report(profile, file)
+    elif profile:
+        blog.profiler.print_report(profile)
 
-def serve(filepath_to_serve: Path):
-    os.chdir(filepath_to_serve)
-    with socketserver.TCPServer((DEFAULT_TEST_HOST, DEFAULT_TEST_PORT), http.server.SimpleHTTPRequestHandler) as httpd:
+
+def watch(blog: Blog):
+    """
+    Builds the blog and then rebuilds it on a background thread each time one of its sources changes. The blog, with its
+    template environment, is kept in memory between builds, so only what changed is parsed and rendered again
+    """
+    # The paths of the watched blog are absolute so that they do not depend on the working directory
+    watched_blog = Blog(blog.main_path)
+    try:
+        build(watched_blog, force=False)
+    except Exception as error:  # serve and watch anyway, the user will fix the error and save again
+        print(f'Error: {error}')
+    watcher = create_watcher([watched_blog.posts_path, watched_blog.templates_path, watched_blog.style_sheets_path,
+                              watched_blog.config_path])
+
+    def rebuild_forever():
+        while True:
+            changed_paths = watcher.wait_for_changes()
+            print(f'Detected changes on {len(changed_paths)} file(s). Rebuilding...')
+            start_time = time.perf_counter()
+            try:
+                build(watched_blog, force=False)
+            except Exception as error:  # keep watching, the user will fix the error and save again
+                print(f'Error: {error}')
+            else:
+                print(f'Rebuilt in {(time.perf_counter() - start_time) * 1000:.0f} ms')
+
+    threading.Thread(target=rebuild_forever, daemon=True).start()
+
+
+def serve(filepath_to_serve: Path, host: str = DEFAULT_TEST_HOST, port: int = DEFAULT_TEST_PORT):
+    from yabi.server import create_server
+
+    with create_server(filepath_to_serve, host, port) as httpd:
         try:
-            print(f'Test server running on: http://{DEFAULT_TEST_HOST}:{DEFAULT_TEST_PORT}')
+            print(f'Test server running on: http://{host}:{httpd.server_address[1]}')
             httpd.serve_forever()
         except KeyboardInterrupt:
             print('Shutting Down Server')
@@ -111,10 +430,18 @@ def execute():
             return 1
 
         if args.command == 'build':
-            build(blog, args.force)
+            return build(blog, args.force, args.jobs, args.profile, args.profile_output, args.shard)
+
+        elif args.command == 'merge':
+            return merge(blog, args.jobs, args.profile, args.profile_output)
+
+        elif args.command == 'check':
+            return check(blog, args.jobs, args.format)
 
-        elif args.command == 'test':
-            serve(blog.website_path)
+        elif args.command in ('serve', 'test'):
+            if args.watch:
+                watch(blog)
+            serve(blog.website_path, args.host, args.port)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,55 @@
+"""
+Precompression of the output files. Each compressible file gets sidecar files with its compressed content next to it,
+e.g., "index.html.gz", so that a static server can send them as they are instead of compressing on each request. Brotli
+sidecars are only written if the optional brotli package is installed
+"""
+import functools
+import hashlib
+from collections.abc import Callable, Iterable
+from pathlib import Path
+
+from yabi.writer import write_atomically
+
+COMPRESSIBLE_SUFFIXES = ('.html', '.css', '.js', '.json', '.xml', '.svg', '.txt')
+
+
+@functools.cache
+def get_compressors() -> dict[str, Callable[[bytes], bytes]]:
+    """
+    Returns the available compression functions by the suffix of their sidecar files. They are only imported here, on
+    the first call, so that a missing brotli package is only looked up once
+    """
+    import gzip
+
+    compressors = {'.gz': lambda data: gzip.compress(data, compresslevel=9, mtime=0)}  # no timestamp, same output on each build
+    try:
+        import brotli
+    except ImportError:
+        pass
+    else:
+        compressors['.br'] = brotli.compress
+    return compressors
+
+
+def is_compressible(path: str | Path) -> bool:
+    return str(path).endswith(COMPRESSIBLE_SUFFIXES)
+
+
+def compress_file(path: Path) -> list[tuple[Path, str, int]]:
+    """ Writes all the sidecars of the file. Returns the path, content hash and size of each one """
+    data = path.read_bytes()
+    sidecars = []
+    for suffix, compress in get_compressors().items():
+        compressed_data = compress(data)
+        sidecar_path = path.with_name(path.name + suffix)
+        write_atomically(sidecar_path, compressed_data)
+        sidecars.append((sidecar_path, hashlib.sha256(compressed_data).hexdigest(), len(compressed_data)))
+    return sidecars
+
+
+def compress_files(paths: Iterable[Path], threads: int) -> list[tuple[Path, str, int]]:
+    """ The compression libraries release the GIL, so the files are compressed in parallel on a pool of threads """
+    from concurrent.futures import ThreadPoolExecutor
+
+    with ThreadPoolExecutor(max_workers=threads, thread_name_prefix='yabi-compression') as executor:
+        return [sidecar for sidecars in executor.map(compress_file, paths) for sidecar in sidecars]
@@ -0,0 +1,59 @@
+"""
+The build manifest is a file saved on the blog directory that records the state of the last build: the hash of the config
+file, the hashes of all the templates, per post, the hash of its content, its parsed metadata and the output paths rendered
+from it, per listing page (index, tags and archive), a signature of the data it was rendered from, and, per output file,
+the hash and size of its content. Comparing against it tells exactly what changed since the last build, regardless of the
+modification times of the files.
+"""
+import hashlib
+import json
+from pathlib import Path
+
+
+def hash_file(path: Path) -> str:
+    return hashlib.sha256(path.read_bytes()).hexdigest()
+
+
+def diff_outputs(previous_outputs: dict[str, list], outputs: dict[str, list], deleted: set[str]) -> dict[str, list[str]]:
+    """ Lists the output files added, changed and deleted between two builds, given their hash and size """
+    return {'added': sorted(outputs.keys() - previous_outputs.keys()),
+            'changed': sorted(key for key in outputs.keys() & previous_outputs.keys() if outputs[key] != previous_outputs[key]),
+            'deleted': sorted((previous_outputs.keys() - outputs.keys()) | deleted)}
+
+
+class BuildManifest:
+    VERSION = 2
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.config_hash: str | None = None
+        self.template_hashes: dict[str, str] = {}
+        self.posts: dict[str, dict] = {}
+        self.pages: dict[str, str] = {}
+        self.outputs: dict[str, list] = {}
+
+    def load(self):
+        """ Loads the manifest of the last build if any. Manifests written by another version are ignored """
+        if not self.path.exists():
+            return
+        data = json.loads(self.path.read_text())
+        if data.get('version') != self.VERSION:
+            return
+        self.config_hash = data['config_hash']
+        self.template_hashes = data['template_hashes']
+        self.posts = data['posts']
+        self.pages = data['pages']
+        self.outputs = data['outputs']
+
+    def save(self):
+        data = {'version': self.VERSION,
+                'config_hash': self.config_hash,
+                'template_hashes': self.template_hashes,
+                'posts': self.posts,
+                'pages': self.pages,
+                'outputs': self.outputs}
+        self.path.write_text(json.dumps(data, sort_keys=True))
+
+    @staticmethod
+    def make_post_entry(content_hash: str, metadata: dict, outputs: list[str]) -> dict:
+        return {'hash': content_hash, 'metadata': metadata, 'outputs': outputs}
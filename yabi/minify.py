@@ -0,0 +1,51 @@
+"""
+Conservative minification of the generated HTML and CSS. It only removes comments and whitespace that cannot change how
+the page is rendered: the content of pre, code, textarea, script and style elements, and the CSS strings, are kept as
+they are
+"""
+import re
+
+VERSION = 2  # part of the cache key of the minified pages, to be increased on any change of the output
+
+_PRESERVED_HTML = re.compile(r'(<(pre|code|textarea|script|style)\b[^>]*>.*?</\2\s*>)', re.DOTALL | re.IGNORECASE)
+_HTML_COMMENT = re.compile(r'<!--(?!\[if).*?-->', re.DOTALL)
+_WHITESPACE = re.compile(r'\s+')
+# Whitespace around these tags is never rendered, as they are not inline elements. List items and table cells are not
+# included, as they are often displayed inline, e.g., the items of the navigation bar of the default style sheet, so
+# the whitespace around them is only collapsed to a single space
+_BLOCK_TAG = re.compile(r'\s*(</?(?:!doctype|html|head|body|meta|link|title|base|header|footer|nav|main|section|article|aside|'
+                        r'div|p|h[1-6]|ul|ol|dl|table|thead|tbody|tfoot|tr|blockquote|hr|br|form|figure|'
+                        r'figcaption)\b[^>]*>)\s*', re.IGNORECASE)
+
+_CSS_STRING = re.compile(r'("(?:\\.|[^"\\])*"|\'(?:\\.|[^\'\\])*\')')
+_CSS_STRING_OR_COMMENT = re.compile(_CSS_STRING.pattern + r'|/\*.*?\*/', re.DOTALL)
+_CSS_PUNCTUATION = re.compile(r'\s*([{};,])\s*')
+_CSS_COLON = re.compile(r':\s+')
+
+
+def minify_html(html: str) -> str:
+    chunks = _PRESERVED_HTML.split(html)
+    # The split returns the text between preserved elements, then each preserved element followed by its tag name
+    minified_chunks = []
+    for idx in range(0, len(chunks), 3):
+        text = _HTML_COMMENT.sub('', chunks[idx])
+        text = _WHITESPACE.sub(' ', text)
+        minified_chunks.append(_BLOCK_TAG.sub(r'\1', text))
+        if idx + 1 < len(chunks):
+            minified_chunks.append(chunks[idx + 1])
+    return ''.join(minified_chunks).strip()
+
+
+def minify_css(css: str) -> str:
+    # Comments are replaced by a space, as they separate tokens, and then the code between strings is minified
+    css = _CSS_STRING_OR_COMMENT.sub(lambda match: match.group(1) or ' ', css)
+    chunks = _CSS_STRING.split(css)
+    # The split returns the code between strings and then each string
+    return ''.join(chunk if idx % 2 else _minify_css_code(chunk) for idx, chunk in enumerate(chunks)).strip()
+
+
+def _minify_css_code(code: str) -> str:
+    code = _WHITESPACE.sub(' ', code)
+    code = _CSS_PUNCTUATION.sub(r'\1', code)
+    code = _CSS_COLON.sub(':', code)
+    return code.replace(';}', '}')
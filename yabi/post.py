@@ -6,10 +6,11 @@ There are two requirements that markdown files should fulfill in order to be con
     2. After the metadata, the next non-empty line should be a level 1 header, i.e., a title prepended by two "#" signs
 """
 import datetime as dt
+import hashlib
+import io
 import re
 from pathlib import Path
-
-import markdown
+from typing import Any
 
 
 class Post:
@@ -17,13 +18,24 @@ class Post:
     DEFAULT_TAG = 'blog'
     INVALID_LABELS = ['_metadata', 'target_path', 'source_path', 'title']
 
+    MAX_HEADER_SIZE = 64 * 1024  # in bytes, the labels and the title are expected before
+
     TITLE_REGEXP = re.compile(r'^\s*#(?!#)\s*(.*?)\s*$', flags=re.MULTILINE)
     METADATA_REGEXP = re.compile(r'^\s*(\w+)\s*:\s*(.+?)\s*$', flags=re.MULTILINE)
 
-    def __init__(self, source_path: Path, target_path: Path):
+    def __init__(self, source_path: Path, target_path: Path, metadata: dict | None = None, content_hash: str | None = None,
+                 body_offset: int | None = None):
+        """
+        The metadata, content hash and offset of the body can be given, e.g., from a cache, to avoid reading and parsing
+        the source file
+        """
         self.source_path = source_path
         self.target_path = target_path
-        self._metadata = self.parse_metadata()
+        self._raw_data = None
+        self._content_hash = content_hash
+        self._body_offset = body_offset
+        self.is_date_missing = False  # whether the date was not given on the file, so it was set to a default
+        self._metadata = metadata if metadata is not None else self.parse_metadata()
 
     def is_dirty(self, target_path: Path) -> bool:
         """ Checks whether the post needs to be rebuilt """
@@ -34,58 +46,112 @@ class Post:
     def is_public(self) -> bool:
         return self._metadata['draft'] != 'yes'
 
+    @property
+    def content_hash(self) -> str:
+        """ Hash of the source file. It is computed only once """
+        if self._content_hash is None:
+            self._content_hash = hashlib.sha256(self._read_raw_data()).hexdigest()
+        return self._content_hash
+
+    @property
+    def body_offset(self) -> int:
+        """ Position, in bytes, where the markdown body starts on the source file, right after the title """
+        if self._body_offset is None:  # the metadata was given without the offset, so the header was not parsed yet
+            self.parse_metadata()
+        return self._body_offset
+
+    def set_default_date(self, date: dt.date):
+        """ Sets the date of a post without a date label, e.g., to the date it was first seen """
+        self._metadata['date'] = date
+
+    def summarize(self) -> 'PostSummary':
+        """ Returns a compact record with the fields needed by the listing pages """
+        labels = {key: value for key, value in self._metadata.items() if key not in PostSummary.FIELD_LABELS}
+        return PostSummary(self._metadata['title'], self._metadata['date'], self._metadata['tags'], self.target_path,
+                           not self.is_public(), labels or None)
+
+    def serialize_metadata(self) -> dict:
+        """ Returns the metadata with only JSON serializable values """
+        return {key: value.isoformat() if isinstance(value, dt.date) else value for key, value in self._metadata.items()}
+
+    @staticmethod
+    def deserialize_metadata(serialized_metadata: dict) -> dict:
+        """ Inverse of the serialize_metadata method """
+        return {**serialized_metadata, 'date': dt.date.fromisoformat(serialized_metadata['date'])}
+
+    def __getstate__(self):
+        # The raw data is only kept to avoid reading the file twice on the same process. It is not worth transferring
+        return {**self.__dict__, '_raw_data': None}
+
     def __getattr__(self, item):
+        # Private names are never metadata. This also prevents an infinite recursion when unpickling an instance, i.e.,
+        # when "_metadata" is looked up before it has been set
+        if item.startswith('_'):
+            raise AttributeError(item)
         return self._metadata[item]
 
     def get_content_in_html(self) -> str:
         """ Transforms content from markdown to html """
-        with self.source_path.open() as file:
-            raw_text = file.read()
-        title = self._metadata['title']
-        index = raw_text.find(title)
-        if index == -1:
-            raise ValueError(f'The title {title} was not found in the text')
-        markdown_text = raw_text[index + len(title):].strip()
-        return markdown.markdown(markdown_text)
+        import markdown
+
+        return markdown.markdown(self.get_markdown_content())
+
+    def get_markdown_content(self) -> str:
+        """ Returns the markdown text following the title of the post """
+        body_offset = self.body_offset
+        if self._raw_data is not None:
+            body = self._raw_data[body_offset:]
+            self._raw_data = None  # not needed anymore once rendered
+        else:
+            with self.source_path.open('rb') as file:
+                file.seek(body_offset)
+                body = file.read()
+        return body.decode().strip()
 
     def parse_metadata(self) -> dict[str, str]:
         """
         Gets all the labels like "label: value" at the beginning of the post and also retrieve the title following
-        this label
+        this label. Only the header is parsed, and the position where the body starts, right after the title, is kept.
+        The file is read only once, as its content is also hashed and rendered. The file is never modified
         """
         metadata = {}
-        with self.source_path.open() as file:
+        with io.BytesIO(self._read_raw_data()) as file:
+            header_size = 0
             for raw_line in file:
-                line = raw_line.strip()
-                if line:
-                    if match := self.METADATA_REGEXP.match(line):
-                        key, value = match.group(1).lower(), match.group(2).lower()
-                        if key in Post.INVALID_LABELS:
-                            print(f'Invalid metadata label entry: "{key}". Ignoring...')
-                            continue
-                        else:
-                            metadata.update({key: value})
-                    elif match := self.TITLE_REGEXP.match(line):
-                        metadata.update({'title': match.group(1)})
-                        break
+                header_size += len(raw_line)
+                if header_size > self.MAX_HEADER_SIZE:
+                    break
+                line = raw_line.decode().strip()
+                if not line:
+                    continue
+                elif match := self.METADATA_REGEXP.match(line):
+                    key, value = match.group(1).lower(), match.group(2).lower()
+                    if key in Post.INVALID_LABELS:
+                        print(f'Invalid metadata label entry: "{key}". Ignoring...')
+                        continue
                     else:
-                        break
+                        metadata.update({key: value})
+                elif match := self.TITLE_REGEXP.match(line):
+                    metadata.update({'title': match.group(1)})
+                    self._body_offset = header_size
+                    break
+                else:
+                    break
 
         # Add default tag if nothing is found
         if 'tags' not in metadata:
             metadata.update({'tags': [Post.DEFAULT_TAG]})
 
-        # Add default date if not found and prepend it to the file
+        # Add today as default date if not found. The caller can set another one, e.g., the date the post was first seen
         if 'date' not in metadata:
-            today = dt.date.today()
-            metadata.update({'date': today})
-            with self.source_path.open() as file:
-                content = file.read()
-            with self.source_path.open(mode='w') as file:
-                file.write(f'date: {today.isoformat()}\n')
-                file.write(content)
+            metadata.update({'date': dt.date.today()})
+            self.is_date_missing = True
         else:
-            metadata.update({'date': dt.date.fromisoformat(metadata['date'])})
+            try:
+                metadata.update({'date': dt.date.fromisoformat(metadata['date'])})
+            except (TypeError, ValueError):
+                raise ValueError(f'Invalid date "{metadata["date"]}" for the file {self.source_path}, expected the format '
+                                 f'YYYY-MM-DD') from None
 
         # Check for errors
         missing_mandatory_labels = set(Post.MANDATORY_LABELS).difference(set(metadata))
@@ -113,3 +179,46 @@ class Post:
             return True
         else:
             return False
+
+    def _read_raw_data(self) -> bytes:
+        if self._raw_data is None:
+            self._raw_data = self.source_path.read_bytes()
+        return self._raw_data
+
+
+class PostSummary:
+    """
+    Compact record of a post with only the fields needed by the listing pages. Any other label of the post is kept on the
+    optional "labels" mapping, and can still be accessed as an attribute
+    """
+    __slots__ = ('title', 'date', 'tags', 'target_path', 'draft', 'labels')
+    FIELD_LABELS = ('title', 'date', 'tags', 'draft')
+
+    def __init__(self, title: str, date: dt.date, tags: list[str], target_path: Path, draft: bool,
+                 labels: dict[str, Any] | None = None):
+        self.title = title
+        self.date = date
+        self.tags = tags
+        self.target_path = target_path
+        self.draft = draft
+        self.labels = labels
+
+    def __getattr__(self, item):
+        # Only called for the labels not stored on a slot. The guard prevents a recursion while unpickling an instance
+        if item == 'labels' or item.startswith('_') or not self.labels or item not in self.labels:
+            raise AttributeError(item)
+        return self.labels[item]
+
+    def __getstate__(self):
+        return tuple(getattr(self, name) for name in self.__slots__)
+
+    def __setstate__(self, state):
+        for name, value in zip(self.__slots__, state):
+            setattr(self, name, value)
+
+    def __eq__(self, other: 'PostSummary'):
+        return isinstance(other, PostSummary) and self.__getstate__() == other.__getstate__()
+
+    def serialize(self) -> list:
+        """ Returns the fields as JSON serializable values """
+        return [self.title, self.date.isoformat(), self.tags, self.target_path.as_posix(), self.draft, self.labels]
@@ -0,0 +1,38 @@
+"""
+Dates of the posts without a "date" label. Each one is dated the day it was first seen by a build, and that date is
+kept on a file of the blog directory, so that it stays the same on later builds while the source file is never modified
+"""
+import datetime as dt
+import json
+from pathlib import Path
+
+
+class PostDates:
+    def __init__(self, path: Path):
+        self.path = path
+        self._dates: dict[str, str] = {}  # post key -> date in ISO format
+        self._is_updated = False
+
+    def load(self):
+        if self.path.exists():
+            self._dates = json.loads(self.path.read_text())
+
+    def get_first_seen_date(self, key: str) -> dt.date:
+        """ Returns the date the post was first seen, which is today for a new post """
+        if key not in self._dates:
+            self._dates[key] = dt.date.today().isoformat()
+            self._is_updated = True
+        return dt.date.fromisoformat(self._dates[key])
+
+    def save(self, existing_keys: set[str] | None = None):
+        """
+        Writes the dates if a new one was added and, if the existing posts are given, forgets the ones of the posts that
+        do not exist anymore
+        """
+        deleted_keys = self._dates.keys() - existing_keys if existing_keys is not None else set()
+        if not self._is_updated and not deleted_keys:
+            return
+        for key in deleted_keys:
+            del self._dates[key]
+        self.path.write_text(json.dumps(self._dates, indent=1, sort_keys=True))
+        self._is_updated = False
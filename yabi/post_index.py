@@ -0,0 +1,31 @@
+import calendar
+from collections.abc import Iterable
+
+from yabi.post import PostSummary
+
+
+class PostIndex:
+    """
+    In-memory index of the posts of a blog built in a single pass. All the posts, and each group of posts by tag and by
+    month, are sorted from the newest to the oldest
+    """
+
+    def __init__(self, posts: Iterable[PostSummary]):
+        # Posts of the same day are sorted by their path, so that the order does not depend on how they were discovered
+        self.posts = sorted(posts, key=lambda post: (post.date, post.target_path), reverse=True)
+        self.by_tag: dict[str, list[PostSummary]] = {}
+        self.by_month: dict[tuple[int, int], list[PostSummary]] = {}
+        for post in self.posts:
+            for tag in post.tags:
+                self.by_tag.setdefault(tag, []).append(post)
+            self.by_month.setdefault((post.date.year, post.date.month), []).append(post)
+
+    def tags(self) -> list[str]:
+        return sorted(self.by_tag)
+
+    def months_by_year(self) -> dict[int, list[tuple[str, list[PostSummary]]]]:
+        """ Groups the posts by year (newest first) and then by month name (oldest first), as shown on the archive """
+        grouped_posts = {}
+        for year, month in sorted(self.by_month, key=lambda year_month: (-year_month[0], year_month[1])):
+            grouped_posts.setdefault(year, []).append((calendar.month_name[month], self.by_month[(year, month)]))
+        return grouped_posts
@@ -0,0 +1,83 @@
+"""
+Instrumentation of the build. It measures the wall time and the number of items of each phase of the build, along with
+the time spent on each post and on each template
+"""
+import json
+import time
+from collections.abc import Iterable, Iterator
+from contextlib import contextmanager
+from typing import TextIO
+
+
+class BuildProfiler:
+    SLOWEST_ITEMS = 10
+
+    def __init__(self):
+        self.phases: dict[str, list[float | int]] = {}  # phase name -> [time in seconds, number of items]
+        self.posts: dict[str, float] = {}
+        self.templates: dict[str, float] = {}
+
+    def add(self, phase: str, seconds: float, count: int = 1):
+        totals = self.phases.setdefault(phase, [0.0, 0])
+        totals[0] += seconds
+        totals[1] += count
+
+    @contextmanager
+    def measure(self, phase: str, count: int = 1):
+        start_time = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(phase, time.perf_counter() - start_time, count)
+
+    def measure_iterable(self, phase: str, iterable: Iterable) -> Iterator:
+        """ Measures only the time spent producing each item of the iterable, which is counted on the phase """
+        iterator = iter(iterable)
+        while True:
+            start_time = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                self.add(phase, time.perf_counter() - start_time, 0)
+                return
+            self.add(phase, time.perf_counter() - start_time)
+            yield item
+
+    def add_post(self, post_name: str, seconds: float):
+        self.posts[post_name] = self.posts.get(post_name, 0.0) + seconds
+
+    def add_template(self, template_name: str, seconds: float):
+        self.templates[template_name] = self.templates.get(template_name, 0.0) + seconds
+
+    def merge(self, other: 'BuildProfiler'):
+        """ Adds the measurements of another profiler, e.g., the one of a worker process """
+        for phase, (seconds, count) in other.phases.items():
+            self.add(phase, seconds, count)
+        for post_name, seconds in other.posts.items():
+            self.add_post(post_name, seconds)
+        for template_name, seconds in other.templates.items():
+            self.add_template(template_name, seconds)
+
+    def report(self) -> dict:
+        return {'phases': {phase: {'seconds': seconds, 'count': count} for phase, (seconds, count) in self.phases.items()},
+                'slowest_posts': self._slowest(self.posts),
+                'slowest_templates': self._slowest(self.templates)}
+
+    def print_report(self, output_format: str = 'text', file: TextIO | None = None):
+        """ Prints the report on the given file, which defaults to the standard output """
+        report = self.report()
+        if output_format == 'json':
+            print(json.dumps(report, indent=2), file=file)
+            return
+
+        print(f'{"Phase":<24}{"Time (ms)":>12}{"Count":>10}', file=file)
+        for phase, totals in report['phases'].items():
+            print(f'{phase:<24}{totals["seconds"] * 1000:>12.1f}{totals["count"]:>10}', file=file)
+        for title, slowest in (('Slowest posts', report['slowest_posts']), ('Slowest templates', report['slowest_templates'])):
+            if slowest:
+                print(f'\n{title}:', file=file)
+                for name, seconds in slowest:
+                    print(f'{seconds * 1000:>10.1f} ms  {name}', file=file)
+
+    def _slowest(self, timings: dict[str, float]) -> list[tuple[str, float]]:
+        return sorted(timings.items(), key=lambda item: item[1], reverse=True)[:self.SLOWEST_ITEMS]
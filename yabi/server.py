@@ -0,0 +1,189 @@
+"""
+Preview server of the generated website. Each request is handled on its own thread and the connections are kept alive.
+Small files are kept in memory along with their gzip compressed content, up to a total size, and are revalidated with a
+single stat call per request, so a rebuild is served right away. Responses carry an ETag and a Last-Modified header, and conditional
+requests are answered with "304 Not Modified"
+"""
+import email.utils
+import gzip
+import hashlib
+import http.server
+import stat
+import threading
+from collections import OrderedDict
+from functools import partial
+from pathlib import Path
+
+
+class CachedFile:
+    __slots__ = ('file_key', 'content', 'compressed_content', 'etag', 'last_modified', 'modification_time')
+
+    def __init__(self, file_key: tuple[int, int, int], content: bytes, compressed_content: bytes | None, etag: str,
+                 modification_time: float):
+        self.file_key = file_key
+        self.content = content
+        self.compressed_content = compressed_content
+        self.etag = etag
+        self.modification_time = int(modification_time)
+        self.last_modified = email.utils.formatdate(modification_time, usegmt=True)
+
+
+class StaticFileCache:
+    """
+    In-memory cache of the served files, keyed by their path. An entry is valid while the size, modification time and
+    inode of its file stay the same. Once the cached content is larger than the maximum size, the least recently served
+    files are evicted. The entry of a deleted file is dropped the next time it is requested
+    """
+    MAX_SIZE = 64 * 1024 * 1024  # of the content of all the files, compressed or not
+    MAX_FILE_SIZE = 1024 * 1024  # larger files are read from disk on each request
+    MIN_COMPRESSED_SIZE = 256  # smaller files are not worth compressing
+    COMPRESSED_CONTENT_TYPES = ('text/', 'application/javascript', 'application/json', 'application/xml', 'image/svg+xml')
+
+    def __init__(self, max_size: int = MAX_SIZE):
+        self.max_size = max_size
+        self.size = 0
+        self._files: OrderedDict[Path, CachedFile] = OrderedDict()  # from the least to the most recently served
+        self._lock = threading.Lock()
+
+    def get(self, path: Path, content_type: str) -> CachedFile | None:
+        """
+        Returns None if the file is not a regular file or is too large to be kept in memory. Raises OSError if the file
+        cannot be read
+        """
+        try:
+            stat_result = path.stat()
+        except FileNotFoundError:
+            with self._lock:
+                self._remove(path)
+            raise
+        if not stat.S_ISREG(stat_result.st_mode) or stat_result.st_size > self.MAX_FILE_SIZE:
+            return None
+        file_key = (stat_result.st_size, stat_result.st_mtime_ns, stat_result.st_ino)
+        with self._lock:
+            cached_file = self._files.get(path)
+            if cached_file is not None and cached_file.file_key == file_key:
+                self._files.move_to_end(path)
+                return cached_file
+
+        content = path.read_bytes()
+        compressed_content = None
+        if len(content) >= self.MIN_COMPRESSED_SIZE and content_type.startswith(self.COMPRESSED_CONTENT_TYPES):
+            compressed_content = gzip.compress(content, mtime=0)
+            if len(compressed_content) >= len(content):
+                compressed_content = None
+        etag = hashlib.sha256(content).hexdigest()[:32]
+        cached_file = CachedFile(file_key, content, compressed_content, etag, stat_result.st_mtime)
+        with self._lock:
+            self._remove(path)
+            self._files[path] = cached_file
+            self.size += self._get_entry_size(cached_file)
+            while self.size > self.max_size and len(self._files) > 1:
+                self._remove(next(iter(self._files)))
+        return cached_file
+
+    def __len__(self) -> int:
+        return len(self._files)
+
+    def _remove(self, path: Path):
+        """ To be called while holding the lock """
+        cached_file = self._files.pop(path, None)
+        if cached_file is not None:
+            self.size -= self._get_entry_size(cached_file)
+
+    @staticmethod
+    def _get_entry_size(cached_file: CachedFile) -> int:
+        return len(cached_file.content) + len(cached_file.compressed_content or b'')
+
+
+class PreviewRequestHandler(http.server.SimpleHTTPRequestHandler):
+    """
+    Serves the files from the in-memory cache. Directory listings, redirections, errors and large files are left to the
+    standard handler
+    """
+    protocol_version = 'HTTP/1.1'  # keeps the connections alive, every response has a Content-Length
+
+    def __init__(self, *args, file_cache: StaticFileCache, **kwargs):
+        self.file_cache = file_cache
+        super().__init__(*args, **kwargs)
+
+    def do_GET(self):
+        if not self._send_cached_file(include_content=True):
+            super().do_GET()
+
+    def do_HEAD(self):
+        if not self._send_cached_file(include_content=False):
+            super().do_HEAD()
+
+    def _send_cached_file(self, include_content: bool) -> bool:
+        """ Returns False if the request has to be handled by the standard handler """
+        path = Path(self.translate_path(self.path))
+        if path.is_dir():
+            if not self.path.partition('?')[0].partition('#')[0].endswith('/'):
+                return False  # redirected by the standard handler
+            path = path / 'index.html'
+        content_type = self.guess_type(str(path))
+        try:
+            cached_file = self.file_cache.get(path, content_type)
+        except OSError:
+            return False
+        if cached_file is None:
+            return False
+
+        content, etag = cached_file.content, f'"{cached_file.etag}"'
+        if cached_file.compressed_content is not None and self._accepts_gzip():
+            content, etag = cached_file.compressed_content, f'"{cached_file.etag}-gzip"'
+
+        if self._is_not_modified(cached_file, etag):
+            self.send_response(http.HTTPStatus.NOT_MODIFIED)
+            self._send_validation_headers(cached_file, etag)
+            self.end_headers()
+            return True
+
+        self.send_response(http.HTTPStatus.OK)
+        self.send_header('Content-Type', content_type)
+        if cached_file.compressed_content is not None:
+            self.send_header('Vary', 'Accept-Encoding')
+            if content is cached_file.compressed_content:
+                self.send_header('Content-Encoding', 'gzip')
+        self.send_header('Content-Length', str(len(content)))
+        self._send_validation_headers(cached_file, etag)
+        self.end_headers()
+        if include_content:
+            self.wfile.write(content)
+        return True
+
+    def _send_validation_headers(self, cached_file: CachedFile, etag: str):
+        self.send_header('ETag', etag)
+        self.send_header('Last-Modified', cached_file.last_modified)
+        self.send_header('Cache-Control', 'no-cache')  # the browser revalidates on each request to show the latest build
+
+    def _is_not_modified(self, cached_file: CachedFile, etag: str) -> bool:
+        # As per RFC 9110, If-Modified-Since is ignored when If-None-Match is present
+        if_none_match = self.headers.get('If-None-Match')
+        if if_none_match is not None:
+            return if_none_match.strip() == '*' or etag in (value.strip().removeprefix('W/') for value in if_none_match.split(','))
+        if_modified_since = self.headers.get('If-Modified-Since')
+        if if_modified_since is None:
+            return False
+        try:
+            since_datetime = email.utils.parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        return since_datetime.tzinfo is not None and cached_file.modification_time <= since_datetime.timestamp()
+
+    def _accepts_gzip(self) -> bool:
+        for coding in self.headers.get('Accept-Encoding', '').split(','):
+            name, _, parameters = coding.partition(';')
+            if name.strip().lower() in ('gzip', '*'):
+                quality = parameters.strip().replace(' ', '').removeprefix('q=')
+                try:
+                    return not parameters.strip() or float(quality) > 0
+                except ValueError:
+                    return False
+        return False
+
+
+def create_server(directory: Path, host: str, port: int) -> http.server.ThreadingHTTPServer:
+    """ The port 0 binds the server to any free port """
+    handler_class = partial(PreviewRequestHandler, directory=str(directory), file_cache=StaticFileCache())
+    return http.server.ThreadingHTTPServer((host, port), handler_class)
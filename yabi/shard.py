@@ -0,0 +1,53 @@
+"""
+Sharded builds, to spread the rendering of the posts of a large blog across several machines. Each shard renders only its
+own slice of the posts, selected by a hash of their paths, and saves a summary of them: their content hash, metadata and
+output files. Once the outputs and summaries of all the shards are gathered on a single blog directory, the merge step
+renders the listing pages from the summaries, without parsing any post again
+"""
+import hashlib
+import json
+from pathlib import Path
+
+
+def is_in_shard(key: str, shard_index: int, shard_count: int) -> bool:
+    """ The shard index goes from 1 to the number of shards. The slice of a post only depends on its key """
+    return int(hashlib.sha256(key.encode()).hexdigest()[:8], 16) % shard_count == shard_index - 1
+
+
+class ShardSummary:
+    VERSION = 1
+
+    def __init__(self, path: Path, shard_index: int = 1, shard_count: int = 1):
+        self.path = path
+        self.shard_index = shard_index
+        self.shard_count = shard_count
+        self.config_hash: str | None = None
+        self.template_hashes: dict[str, str] = {}
+        self.posts: dict[str, dict] = {}  # post key -> manifest entry of the post
+        self.outputs: dict[str, list] = {}  # relative path -> [content hash, size]
+
+    @staticmethod
+    def get_file_name(shard_index: int, shard_count: int) -> str:
+        return f'shard_{shard_index}_of_{shard_count}.json'
+
+    def load(self):
+        data = json.loads(self.path.read_text())
+        if data.get('version') != self.VERSION:
+            raise ValueError(f'The shard summary {self.path} was written by another version of yabi')
+        self.shard_index = data['shard_index']
+        self.shard_count = data['shard_count']
+        self.config_hash = data['config_hash']
+        self.template_hashes = data['template_hashes']
+        self.posts = data['posts']
+        self.outputs = data['outputs']
+
+    def save(self):
+        data = {'version': self.VERSION,
+                'shard_index': self.shard_index,
+                'shard_count': self.shard_count,
+                'config_hash': self.config_hash,
+                'template_hashes': self.template_hashes,
+                'posts': self.posts,
+                'outputs': self.outputs}
+        self.path.parent.mkdir(exist_ok=True)
+        self.path.write_text(json.dumps(data, sort_keys=True))
@@ -0,0 +1,240 @@
+"""
+File watchers used to rebuild the blog whenever one of its sources changes. If the optional watchdog package is
+installed, the changes are notified by the operating system. Otherwise, the files are polled using only the standard
+library: every poll costs one stat call per watched file and directory, and only the directories whose modification time
+changed, i.e., that had files added, deleted or renamed, are listed again
+"""
+import os
+import threading
+import time
+from collections.abc import Iterable
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:  # watchdog is optional, and only imported when watching
+    from watchdog.events import FileSystemEvent
+
+
+def create_watcher(watched_paths: Iterable[Path]) -> 'Watcher | EventWatcher':
+    """ Watches the paths with the notifications of the operating system if possible, by polling them otherwise """
+    try:
+        import watchdog  # noqa: F401
+    except ImportError:
+        return Watcher(watched_paths)
+    return EventWatcher(watched_paths)
+
+
+class _Directory:
+    __slots__ = ('mtime', 'file_names', 'subdirectory_names')
+
+    def __init__(self, mtime: int | None):
+        self.mtime = mtime
+        self.file_names: set[str] = set()
+        self.subdirectory_names: set[str] = set()
+
+
+class Watcher:
+    DEFAULT_POLL_INTERVAL = 0.05
+    DEFAULT_DEBOUNCE_INTERVAL = 0.05
+    MAX_POLLING_LOAD = 0.1  # fraction of the time spent polling. On large trees, the poll interval grows to keep it
+
+    def __init__(self, watched_paths: Iterable[Path], poll_interval: float = DEFAULT_POLL_INTERVAL,
+                 debounce_interval: float = DEFAULT_DEBOUNCE_INTERVAL):
+        """
+        The watched paths can be either files or directories. Directories are watched recursively. A missing path is
+        watched until it is created, either as a file or as a directory
+        """
+        self.watched_paths = list(watched_paths)
+        self.poll_interval = poll_interval
+        self.debounce_interval = debounce_interval
+        self.poll_duration = 0.0
+        self._directories: dict[str, _Directory] = {}
+        self._files: dict[str, tuple[int, int] | None] = {}  # file -> modification time and size, None if missing
+        self._root_directories = set()
+        self._missing_paths = set()
+        for watched_path in self.watched_paths:
+            if watched_path.is_dir():
+                self._root_directories.add(str(watched_path))
+                self._scan_directory(str(watched_path), set())
+            elif watched_path.exists():
+                self._files[str(watched_path)] = self._stat_file(str(watched_path))
+            else:
+                self._missing_paths.add(str(watched_path))
+
+    @staticmethod
+    def _stat_file(file_path: str) -> tuple[int, int] | None:
+        try:
+            stat_result = os.stat(file_path)
+        except FileNotFoundError:
+            return None
+        return stat_result.st_mtime_ns, stat_result.st_size
+
+    def _scan_directory(self, directory_path: str, changed_paths: set[str]):
+        """ Lists the directory again, and recursively any new subdirectory. Added and deleted files are changed paths """
+        try:
+            directory_mtime = os.stat(directory_path).st_mtime_ns
+            entries = list(os.scandir(directory_path))
+        except (FileNotFoundError, NotADirectoryError):
+            self._forget_directory(directory_path, changed_paths)
+            return
+        directory = self._directories.setdefault(directory_path, _Directory(None))
+        directory.mtime = directory_mtime
+
+        file_names, subdirectory_names = set(), set()
+        for entry in entries:
+            try:
+                is_directory = entry.is_dir(follow_symlinks=True)
+            except OSError:
+                continue
+            (subdirectory_names if is_directory else file_names).add(entry.name)
+
+        for file_name in file_names - directory.file_names:
+            file_path = os.path.join(directory_path, file_name)
+            self._files[file_path] = self._stat_file(file_path)
+            changed_paths.add(file_path)
+        for file_name in directory.file_names - file_names:
+            file_path = os.path.join(directory_path, file_name)
+            self._files.pop(file_path, None)
+            changed_paths.add(file_path)
+        for subdirectory_name in directory.subdirectory_names - subdirectory_names:
+            self._forget_directory(os.path.join(directory_path, subdirectory_name), changed_paths)
+        new_subdirectory_names = subdirectory_names - directory.subdirectory_names
+        directory.file_names, directory.subdirectory_names = file_names, subdirectory_names
+        for subdirectory_name in new_subdirectory_names:
+            self._scan_directory(os.path.join(directory_path, subdirectory_name), changed_paths)
+
+    def _forget_directory(self, directory_path: str, changed_paths: set[str]):
+        """ A deleted directory. The watched directories are kept, to be scanned again if they are created again """
+        directory = self._directories.get(directory_path)
+        if directory is None:
+            return
+        for file_name in directory.file_names:
+            file_path = os.path.join(directory_path, file_name)
+            self._files.pop(file_path, None)
+            changed_paths.add(file_path)
+        for subdirectory_name in directory.subdirectory_names:
+            self._forget_directory(os.path.join(directory_path, subdirectory_name), changed_paths)
+        if directory_path in self._root_directories:
+            self._directories[directory_path] = _Directory(None)
+        else:
+            del self._directories[directory_path]
+
+    def poll(self) -> set[Path]:
+        """ Returns the files that were added, modified or deleted since the last poll """
+        start_time = time.perf_counter()
+        changed_paths = set()
+        for missing_path in list(self._missing_paths):
+            if os.path.isdir(missing_path):
+                self._missing_paths.remove(missing_path)
+                self._root_directories.add(missing_path)
+                self._scan_directory(missing_path, changed_paths)
+            elif os.path.exists(missing_path):
+                self._missing_paths.remove(missing_path)
+                self._files[missing_path] = self._stat_file(missing_path)
+                changed_paths.add(missing_path)
+
+        for directory_path in list(self._directories):
+            if directory_path not in self._directories:  # forgotten along with a deleted parent
+                continue
+            try:
+                directory_mtime = os.stat(directory_path).st_mtime_ns
+            except FileNotFoundError:
+                directory_mtime = None
+            if directory_mtime != self._directories[directory_path].mtime:
+                self._scan_directory(directory_path, changed_paths)
+
+        for file_path, signature in self._files.items():
+            new_signature = self._stat_file(file_path)
+            if new_signature != signature:
+                self._files[file_path] = new_signature
+                changed_paths.add(file_path)
+        self.poll_duration = time.perf_counter() - start_time
+        return {Path(file_path) for file_path in changed_paths}
+
+    def get_poll_interval(self) -> float:
+        """ The given poll interval, unless polling a large tree that often would keep a core busy """
+        return max(self.poll_interval, self.poll_duration / self.MAX_POLLING_LOAD)
+
+    def wait_for_changes(self) -> set[Path]:
+        """
+        Blocks until a change is detected. Bursts of changes, e.g., an editor saving several files, are collected
+        together until nothing changes during the debounce interval
+        """
+        while not (changed_paths := self.poll()):
+            time.sleep(self.get_poll_interval())
+        while True:
+            time.sleep(self.debounce_interval)
+            if not (new_changed_paths := self.poll()):
+                return changed_paths
+            changed_paths |= new_changed_paths
+
+
+class EventWatcher:
+    """
+    Watches the paths through the file system notifications of the operating system, using the watchdog package, so
+    that a change is seen as soon as it happens without polling. It has the same interface as the polling watcher
+    """
+    EVENT_TYPES = ('created', 'modified', 'deleted', 'moved')  # not the ones of files opened or closed without writing
+
+    def __init__(self, watched_paths: Iterable[Path], debounce_interval: float = Watcher.DEFAULT_DEBOUNCE_INTERVAL):
+        """
+        The watched paths can be either files or directories. Directories are watched recursively. A missing path is
+        watched until it is created, either as a file or as a directory, through its closest existing parent directory
+        """
+        from watchdog.observers import Observer
+
+        self.watched_paths = list(watched_paths)
+        self.debounce_interval = debounce_interval
+        # A missing path is both a watched file and a watched directory
+        self._watched_directories = tuple(str(path) + os.sep for path in self.watched_paths if not path.is_file())
+        self._watched_files = {str(path) for path in self.watched_paths if not path.is_dir()}
+        self._changed_paths: set[str] = set()
+        self._condition = threading.Condition()
+
+        self._observer = Observer()
+        self._observer.daemon = True
+        for watched_path in self.watched_paths:
+            if watched_path.is_dir():
+                self._observer.schedule(self, str(watched_path), recursive=True)
+            elif watched_path.is_file():
+                self._observer.schedule(self, str(watched_path.parent), recursive=False)
+            else:
+                existing_parent_path = next(parent_path for parent_path in watched_path.parents if parent_path.is_dir())
+                self._observer.schedule(self, str(existing_parent_path), recursive=True)
+        self._observer.start()
+
+    def dispatch(self, event: 'FileSystemEvent'):
+        """ Called by the observer thread on each event """
+        if event.is_directory or event.event_type not in self.EVENT_TYPES:
+            return
+        event_paths = {os.fsdecode(event.src_path), os.fsdecode(getattr(event, 'dest_path', ''))} - {''}
+        changed_paths = {path for path in event_paths
+                         if path in self._watched_files or path.startswith(self._watched_directories)}
+        if changed_paths:
+            with self._condition:
+                self._changed_paths |= changed_paths
+                self._condition.notify_all()
+
+    def poll(self) -> set[Path]:
+        """ Returns the files that were added, modified or deleted since the last poll """
+        with self._condition:
+            changed_paths, self._changed_paths = self._changed_paths, set()
+        return {Path(file_path) for file_path in changed_paths}
+
+    def wait_for_changes(self) -> set[Path]:
+        """
+        Blocks until a change is detected. Bursts of changes, e.g., an editor saving several files, are collected
+        together until nothing changes during the debounce interval
+        """
+        with self._condition:
+            self._condition.wait_for(lambda: self._changed_paths)
+        changed_paths = self.poll()
+        while True:
+            time.sleep(self.debounce_interval)
+            if not (new_changed_paths := self.poll()):
+                return changed_paths
+            changed_paths |= new_changed_paths
+
+    def stop(self):
+        self._observer.stop()
+        self._observer.join()
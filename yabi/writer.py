@@ -0,0 +1,139 @@
+import hashlib
+import os
+import threading
+from collections.abc import Iterator
+from contextlib import contextmanager
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:  # the thread pool is only imported once needed
+    from concurrent.futures import Future, ThreadPoolExecutor
+
+
+def write_atomically(target_path: Path, data: bytes):
+    """
+    Writes the file to a temporary file first and then renames it, so that a reader never sees a partially written
+    file. The temporary name is unique per process and thread
+    """
+    temporary_path = target_path.with_name(f'.{target_path.name}.{os.getpid()}.{threading.get_ident()}.tmp')
+    try:
+        temporary_path.write_bytes(data)
+        os.replace(temporary_path, target_path)
+    except BaseException:
+        temporary_path.unlink(missing_ok=True)
+        raise
+
+
+class OutputWriter:
+    """
+    Writes the output files of the build. A file is only rewritten if its content changed, so that its modification
+    time, and thus any synchronization or cache validation based on it, is preserved. Files are written to a temporary
+    file first and then renamed, so that a reader never sees a partially written file. The parent directories are
+    created as needed, only once each.
+
+    Within the "threaded" context, the files are written on a pool of threads, so that the rendering of the pages
+    overlaps with the disk I/O
+    """
+    PENDING_WRITES_PER_THREAD = 16
+
+    def __init__(self, base_path: Path):
+        self.base_path = base_path
+        self.outputs: dict[str, list] = {}  # relative path -> [content hash, size]
+        self.deleted: set[str] = set()
+        self.written_keys: set[str] = set()  # relative paths of the files actually written, i.e., new or changed
+        self.written = 0
+        self.skipped = 0
+        self._created_directories: set[Path] = set()
+        self._lock = threading.Lock()
+        self._executor: 'ThreadPoolExecutor | None' = None
+        self._pending_writes: threading.BoundedSemaphore | None = None
+        self._errors: list[BaseException] = []
+
+    def __getstate__(self):
+        # Only the records are transferred, e.g., from a worker process
+        return {'base_path': self.base_path, 'outputs': self.outputs, 'deleted': self.deleted,
+                'written_keys': self.written_keys, 'written': self.written, 'skipped': self.skipped}
+
+    def __setstate__(self, state):
+        self.__init__(state['base_path'])
+        self.__dict__.update(state)
+
+    @contextmanager
+    def threaded(self, threads: int) -> Iterator['OutputWriter']:
+        """ Writes the files on a pool of threads until exiting the context, where all the pending writes are waited for """
+        from concurrent.futures import ThreadPoolExecutor
+
+        self._executor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix='yabi-writer')
+        self._pending_writes = threading.BoundedSemaphore(threads * self.PENDING_WRITES_PER_THREAD)
+        try:
+            yield self
+        finally:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+        if self._errors:
+            error, self._errors = self._errors[0], []
+            raise error
+
+    def write(self, target_path: Path, content: str, previous_output: list | None = None):
+        """ The previous output is the hash and size recorded on the last build. It avoids reading the existing file """
+        data = content.encode()
+        output = [hashlib.sha256(data).hexdigest(), len(data)]
+        key = target_path.relative_to(self.base_path).as_posix()
+        self.outputs[key] = output
+        if self._executor is None:
+            self._write_file(target_path, key, data, output, previous_output)
+        else:
+            self._pending_writes.acquire()  # bounds the rendered pages waiting to be written
+            future = self._executor.submit(self._write_file, target_path, key, data, output, previous_output)
+            future.add_done_callback(self._on_write_done)
+
+    def _on_write_done(self, future: 'Future'):
+        self._pending_writes.release()
+        if future.exception() is not None:
+            self._errors.append(future.exception())
+
+    def _write_file(self, target_path: Path, key: str, data: bytes, output: list, previous_output: list | None):
+        if self._is_unchanged(target_path, data, output, previous_output):
+            with self._lock:
+                self.skipped += 1
+            return
+
+        if target_path.parent not in self._created_directories:
+            target_path.parent.mkdir(parents=True, exist_ok=True)
+            self._created_directories.add(target_path.parent)
+        write_atomically(target_path, data)
+        with self._lock:
+            self.written += 1
+            self.written_keys.add(key)
+
+    def record(self, target_path: Path, content_hash: str, size: int):
+        """ Records an output file written by other means, e.g., a copied file """
+        self.outputs[target_path.relative_to(self.base_path).as_posix()] = [content_hash, size]
+
+    def delete(self, target_path: Path):
+        key = target_path.relative_to(self.base_path).as_posix()
+        target_path.unlink(missing_ok=True)
+        self.outputs.pop(key, None)
+        self.written_keys.discard(key)
+        self.deleted.add(key)
+
+    def merge(self, other: 'OutputWriter'):
+        """ Adds the records of another writer, e.g., the one of a worker process """
+        self.outputs.update(other.outputs)
+        self.deleted.update(other.deleted)
+        self.written_keys.update(other.written_keys)
+        self.written += other.written
+        self.skipped += other.skipped
+
+    @staticmethod
+    def _is_unchanged(target_path: Path, data: bytes, output: list, previous_output: list | None) -> bool:
+        try:
+            stat_result = target_path.stat()
+        except FileNotFoundError:
+            return False
+        if stat_result.st_size != len(data):
+            return False
+        elif previous_output is not None:
+            return previous_output == output
+        else:
+            return target_path.read_bytes() == data